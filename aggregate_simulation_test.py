@@ -0,0 +1,57 @@
+import random, sys
+random.seed(42)
+import os
+import numpy as np
+from logger import Logger, LOG_NONE
+from virus import Virus
+from aggregate_simulation import AggregateSimulation
+from ensemble import run_replicate
+import pytest
+
+
+def test_create_population():
+    virus = Virus("Smallpox", 0.06, 0.15)
+    sim = AggregateSimulation(100, 0.90, virus)
+    sim._create_population(sim.initial_infected)
+    assert sim.vaccinated + sim.infected_vaccinated == 90
+    assert sim.infected + sim.infected_vaccinated == sim.initial_infected
+    assert sim.susceptible + sim.vaccinated + sim.infected + sim.infected_vaccinated == 100
+    assert sim.current_infected == sim.initial_infected
+
+def test_counts_add_up():
+    virus = Virus("Ebola", 0.25, 0.70)
+    sim = AggregateSimulation(5000, 0.30, virus, logger=Logger(os.devnull, os.devnull,
+        log_level=LOG_NONE))
+    for stats in sim.iter_steps():
+        assert sim.susceptible + sim.vaccinated + sim.infected == sim.living
+        assert sim.living + sim.total_dead == sim.pop_size
+        assert stats.newly_infected == sim.infected == sim.current_infected
+    assert sim.current_infected == 0
+
+def test_no_one_left_to_interact_with():
+    virus = Virus("Smallpox", 1.0, 0.0)
+    sim = AggregateSimulation(1, 0.0, virus, initial_infected=1)
+    sim._create_population(sim.initial_infected)
+    sim.time_step()
+    assert sim.current_infected == 0
+    assert sim.saved_from_vac == 0
+
+def test_matches_person_engine():
+    config = {'pop_size': 500, 'vacc_percentage': 0.1, 'virus_name': 'Ebola',
+        'mortality_rate': 0.7, 'repro_rate': 0.5, 'initial_infected': 10}
+    results = {}
+    for engine, seeds in [('person', range(30)), ('aggregate', range(100, 200))]:
+        results[engine] = [run_replicate(dict(config, engine=engine), seed) for seed in seeds]
+    for metric in ('total_infected', 'total_dead', 'saved_from_vac'):
+        expected = np.array([result[metric] for result in results['person']])
+        values = np.array([result[metric] for result in results['aggregate']])
+        error = np.sqrt(expected.var() / len(expected) + values.var() / len(values))
+        assert abs(values.mean() - expected.mean()) < 4 * error + 1
+
+def test_billion_people():
+    virus = Virus("Smallpox", 0.06, 0.15)
+    sim = AggregateSimulation(10 ** 9, 0.5, virus, logger=Logger(os.devnull, os.devnull,
+        log_level=LOG_NONE))
+    steps = list(sim.iter_steps())
+    assert sim.total_infected > 10 ** 8
+    assert steps[-1].total_dead == sim.total_dead
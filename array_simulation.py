@@ -0,0 +1,254 @@
+import numpy as np
+import event_log
+from simulation import Simulation
+from population import seed_population
+
+
+def draw_contacts(rng, living, positions, count, reach=None):
+    ''' Draws count contacts for each person at positions in living, uniformly among
+    the others in the first reach of living, by default all of it. reach is an array
+    with one length per person. People with nobody else in reach make no contacts.
+    Returns the slots of the person making each contact and of the person contacted,
+    as two arrays of the same length.
+    '''
+    if reach is not None:
+        has_contacts = reach > 1
+        positions, reach = positions[has_contacts], reach[has_contacts]
+    high = len(living) - 1 if reach is None else (reach - 1)[:, None]
+    #Draws among everybody else in reach, then skips over the person's own position
+    draws = rng.integers(0, high, size=(len(positions), count))
+    draws += draws >= positions[:, None]
+    return np.repeat(living[positions], count), living[draws.ravel()]
+
+
+def roll_contacts(rng, sources, contacts, vaccinated, infected, repro_rate, outcomes=False):
+    ''' Applies the rules of Simulation.interaction to an array of contacted slots,
+    made by the people in sources. Vaccinated contacts are saved, infected contacts
+    are skipped and every other contact is infected with a chance of repro_rate.
+    The infected are run in slot order, so an infected contact before its source
+    has recovered by then and counts as vaccinated.
+
+        Returns:
+            tuple: The number of vaccinated contacts, the positions in contacts of
+            the infected ones, and the outcome code of every contact if outcomes is
+            True or else None.
+    '''
+    is_infected = infected[contacts]
+    is_vaccinated = vaccinated[contacts] | (is_infected & (contacts < sources))
+    is_sick = ~is_vaccinated & is_infected
+    susceptible = np.flatnonzero(~is_vaccinated & ~is_sick)
+    infect = susceptible[rng.random(len(susceptible)) <= repro_rate]
+    codes = None
+    if outcomes:
+        #Same outcome codes as the results of Simulation.interaction
+        codes = np.full(len(contacts), event_log.OUTCOME_CODES['did_not_infect'], dtype=np.uint8)
+        codes[is_vaccinated] = event_log.OUTCOME_CODES['is_vaccinated']
+        codes[is_sick] = event_log.OUTCOME_CODES['is_not_sick']
+        codes[infect] = event_log.OUTCOME_CODES['did_infect']
+    return int(np.count_nonzero(is_vaccinated)), infect, codes
+
+
+class ArraySimulation(Simulation):
+    ''' Simulation engine that keeps the population as parallel NumPy arrays
+    instead of a list of Person objects.
+
+    Person i+1 lives in slot i of the ids, alive, vaccinated and infected arrays.
+    The slots of the living are also kept packed at the front of living, with
+    living_position giving each slot's place there, so contacts are drawn straight
+    from it however many people have died.
+    Every time step is run as batched array operations: the survival of every
+    infected person is rolled first, then the contacts of every infected person are
+    drawn at once, followed by the infection rolls.
+
+    The rules are the same as Simulation.time_step, Simulation.interaction and
+    Person.did_survive_infection, which run the infected one after the other in _id
+    order. Knowing who dies in advance, each infected person only draws among the
+    people still alive by their turn, and meets the infected before them as
+    recovered, so the outcomes have the same distribution as in Simulation.
+    '''
+    #Rolls survival before the contacts since contacts depend on it
+    engine_version = Simulation.engine_version + 1
+    engine_name = 'array'
+    profile_phases = ('_order_dying', '_interact_chunk', '_resolve_infections',
+        '_remove_living', '_infect_newly_infected')
+
+    def __init__(self, pop_size, vacc_percentage, virus, initial_infected=10,
+        chunk_size=10000, **kwargs):
+        ''' The chunk size is the number of infected people whose contacts are drawn
+        together. It bounds the memory used for contacts to chunk_size * 100 ids.
+        Other keyword arguments are passed on to Simulation.
+        '''
+        super().__init__(pop_size, vacc_percentage, virus, initial_infected, **kwargs)
+        self.chunk_size = chunk_size # Int
+        self.interactions_per_person = 100 # Int
+        self.ids = np.empty(0, dtype=np.int64)
+        self.alive = np.empty(0, dtype=bool)
+        self.vaccinated = np.empty(0, dtype=bool)
+        self.infected = np.empty(0, dtype=bool)
+        self.infected_idx = np.empty(0, dtype=np.int64) # Sorted slots of the infected
+        self.living = np.empty(0, dtype=np.int64) # Slots of the living, in no particular order
+        self.living_position = np.empty(0, dtype=np.int64) # Index in living of each slot
+        self.newly_infected = np.empty(0, dtype=np.int64)
+
+    def _create_population(self, initial_infected):
+        '''Creates the population arrays. Uses the same seeding as Simulation:
+        a random set of vaccinated people and an independent random set of
+        initially infected people.
+        '''
+        amount_vaccinated = int(self.vacc_percentage * self.pop_size)
+        #Filled in chunks, without index arrays the size of the seeded sets
+        self.vaccinated, self.infected = seed_population(self.rng, self.pop_size,
+            amount_vaccinated, initial_infected)
+
+        self.ids = np.arange(1, self.pop_size + 1, dtype=np.int64)
+        self.alive = np.ones(self.pop_size, dtype=bool)
+        self.infected_idx = np.flatnonzero(self.infected)
+        self.newly_infected = self.ids[self.infected_idx]
+        self.current_infected += initial_infected
+        self.total_vaccinated += amount_vaccinated - int(np.count_nonzero(
+            self.vaccinated[self.infected_idx]))
+        self.living = np.arange(self.pop_size, dtype=np.int64)
+        self.living_position = np.arange(self.pop_size, dtype=np.int64)
+
+    def _population_state(self):
+        '''Returns the population arrays, for checkpoints.'''
+        return {'alive': self.alive, 'vaccinated': self.vaccinated, 'infected': self.infected,
+            'living': self.living}
+
+    def _restore_population_state(self, arrays):
+        '''Copies the population arrays back from a checkpoint.'''
+        self.ids = np.arange(1, self.pop_size + 1, dtype=np.int64)
+        self.alive = np.array(arrays['alive'], dtype=bool)
+        self.vaccinated = np.array(arrays['vaccinated'], dtype=bool)
+        self.infected = np.array(arrays['infected'], dtype=bool)
+        self.infected_idx = np.flatnonzero(self.infected)
+        self.living = np.array(arrays['living'], dtype=np.int64)
+        self.living_position = np.zeros(self.pop_size, dtype=np.int64)
+        self.living_position[self.living] = np.arange(len(self.living))
+
+    def time_step(self):
+        ''' Computes one time step for every infected person at once.
+
+        1. Every person that started the step infected is rolled to die or become
+            immune, taking effect in _id order.
+        2. Each infected person draws 100 random people other than themselves,
+            among those alive by their turn.
+        3. Vaccinated contacts and infected ones that recovered before count as
+            saved_from_vac, other infected contacts are skipped and every other
+            contact is infected with a chance of the repro_rate.
+
+        The infected are taken from self.infected_idx, contacts from self.living, and
+        the counters are updated from what changed, so only the infected and their
+        contacts are visited.
+        '''
+        infected_idx = self.infected_idx
+        dies = self.rng.random(len(infected_idx)) < self.virus.mortality_rate
+        reach = self._order_dying(infected_idx, dies)
+        new_infections = self._interact(infected_idx, reach)
+        died = self._resolve_infections(infected_idx, dies)
+        self.total_dead += died
+        self.total_vaccinated += len(infected_idx) - died
+        #The same person can be infected by several contacts. Sorting and dropping
+        #repeats by hand is much faster than np.unique on large arrays.
+        infected_idx = np.sort(np.concatenate(new_infections)) if new_infections \
+            else np.empty(0, dtype=np.int64)
+        self.infected_idx = np.delete(infected_idx,
+            np.flatnonzero(infected_idx[1:] == infected_idx[:-1]) + 1)
+        self.newly_infected = self.ids[self.infected_idx]
+        self._infect_newly_infected()
+        self.current_infected = len(self.infected_idx)
+        self.total_infected += self.current_infected
+
+    def _order_dying(self, infected_idx, dies):
+        ''' Moves the infected that die this step to the end of living, the last in
+        _id order first, so the people alive at the turn of each infected person are
+        the front of living. Returns how many people that is for each of infected_idx.
+        '''
+        dying = infected_idx[dies][::-1]
+        start = len(self.living) - len(dying)
+        #Places the dying leave in the front, and the people past start to fill them with
+        holes = self.living_position[dying]
+        holes = np.sort(holes[holes < start])
+        tail = self.living[start:]
+        movers = tail[~np.isin(tail, dying)]
+        self.living[holes] = movers
+        self.living_position[movers] = holes
+        self.living[start:] = dying
+        self.living_position[dying] = np.arange(start, len(self.living))
+        return len(self.living) - (np.cumsum(dies) - dies)
+
+    def _interact(self, infected_idx, reach=None):
+        ''' Runs the interactions of everybody in infected_idx, chunk_size people at a
+        time. Each draws among the first reach of living, by default all of it.
+        Returns a list of arrays of the slots they infected, possibly repeated.
+        '''
+        new_infections = []
+        #With nobody else alive there is no one left to interact with
+        if len(self.living) > 1:
+            if reach is None:
+                reach = np.full(len(infected_idx), len(self.living))
+            positions = self.living_position[infected_idx]
+            for start in range(0, len(infected_idx), self.chunk_size):
+                new_infections.append(self._interact_chunk(self.living,
+                    positions[start:start + self.chunk_size],
+                    reach[start:start + self.chunk_size]))
+        return new_infections
+
+    def _interact_chunk(self, living, positions, reach=None):
+        ''' Draws the contacts for a chunk of infected people and rolls their infections.
+
+            Args:
+                living (array): Slots of everybody alive at the start of the step.
+                positions (array): Position of each infected person within living.
+                reach (array): How much of the front of living each infected person
+                    can meet, by default all of it.
+
+            Returns:
+                array: Slots infected by the chunk, possibly repeated.
+        '''
+        sources, contacts = self._draw_contacts(living, positions, reach)
+        saved, infect, outcomes = roll_contacts(self.rng, sources, contacts, self.vaccinated,
+            self.infected, self.virus.repro_rate, self.logger.logs_interactions)
+        self.saved_from_vac += saved
+        if outcomes is not None:
+            self.logger.log_interactions(self.ids[sources], self.ids[contacts], outcomes)
+        return contacts[infect]
+
+    def _draw_contacts(self, living, positions, reach=None):
+        ''' Draws interactions_per_person contacts for each infected person of a chunk,
+        arguments as for _interact_chunk. Returns the slots of the person making each
+        contact and of the person contacted, as two arrays of the same length.
+        '''
+        return draw_contacts(self.rng, living, positions, self.interactions_per_person, reach)
+
+    def _resolve_infections(self, infected_idx, died):
+        ''' Applies the survival rolls of everybody infected at the start of the step,
+        died being whether each one dies. Survivors become immune, the others die, and
+        nobody stays infected. Returns the number of deaths.
+        '''
+        self.alive[infected_idx[died]] = False
+        self._remove_living(infected_idx[died])
+        self.vaccinated[infected_idx] = True
+        self.infected[infected_idx] = False
+        if self.logger.logs_survival:
+            self.logger.log_infection_survivals(self.ids[infected_idx], self.alive[infected_idx])
+        return int(np.count_nonzero(died))
+
+    def _remove_living(self, dead):
+        ''' Removes the slots in dead from living. The living at the end of the array
+        are moved into the places the dead leave, so this takes time in proportion to
+        the number of dead and not the population.
+        '''
+        remaining = len(self.living) - len(dead)
+        #Places that have to be filled, and the living past the new end to fill them with
+        holes = self.living_position[dead]
+        holes = np.sort(holes[holes < remaining])
+        tail = self.living[remaining:]
+        movers = tail[self.alive[tail]]
+        self.living[holes] = movers
+        self.living_position[movers] = holes
+        self.living = self.living[:remaining]
+
+    def _infect_newly_infected(self):
+        ''' Marks every id in self.newly_infected as infected. '''
+        self.infected[self.newly_infected - 1] = True
@@ -0,0 +1,113 @@
+import random, sys
+random.seed(42)
+import os
+import numpy as np
+from logger import Logger, LOG_NONE
+from virus import Virus
+from simulation import Simulation
+from array_simulation import ArraySimulation
+import pytest
+
+
+def quiet():
+    return Logger(os.devnull, os.devnull, log_level=LOG_NONE)
+
+def test_create_population():
+    virus = Virus("Smallpox", 0.06, 0.15)
+    sim = ArraySimulation(100, 0.90, virus, logger=quiet())
+    sim._create_population(sim.initial_infected)
+    assert len(sim.alive) == sim.pop_size
+    assert np.count_nonzero(sim.vaccinated) == 90
+    assert np.count_nonzero(sim.infected) == sim.initial_infected
+    assert sim.current_infected == sim.initial_infected
+    assert list(sim.ids[:3]) == [1, 2, 3]
+
+def test_time_step_resolves_infected():
+    virus = Virus("Smallpox", 0.0, 1.0)
+    sim = ArraySimulation(100, 0.50, virus, logger=quiet())
+    sim._create_population(sim.initial_infected)
+    sim.time_step()
+    #Everybody infected dies, and nobody new can be infected
+    assert sim.total_dead == sim.initial_infected
+    assert sim.current_infected == 0
+    assert not np.any(sim.infected)
+
+def test_time_step_counts_saved_from_vac():
+    virus = Virus("Smallpox", 1.0, 0.0)
+    sim = ArraySimulation(1000, 0.50, virus, initial_infected=1, logger=quiet())
+    sim._create_population(sim.initial_infected)
+    sim.time_step()
+    #Every interaction either hits a vaccinated person or infects someone
+    assert sim.saved_from_vac + len(sim.newly_infected) <= 100
+    assert sim.saved_from_vac > 0
+    assert sim.current_infected == len(sim.newly_infected)
+    assert sim.total_dead == 0
+
+def test_no_one_left_to_interact_with():
+    virus = Virus("Smallpox", 1.0, 0.0)
+    sim = ArraySimulation(1, 0.0, virus, initial_infected=1, logger=quiet())
+    sim._create_population(sim.initial_infected)
+    sim.time_step()
+    assert sim.current_infected == 0
+    assert sim.saved_from_vac == 0
+
+def saved_from_vac(engine, seeds, **kwargs):
+    '''Returns saved_from_vac of a run of engine for each seed.'''
+    virus = Virus("Ebola", 0.5, 0.7)
+    saved = []
+    for seed in seeds:
+        sim = engine(500, 0.1, virus, logger=quiet(), seed=seed, **kwargs)
+        sim.run(plot=False)
+        saved.append(sim.saved_from_vac)
+    return np.array(saved)
+
+def test_saved_from_vac_matches_person_engine():
+    #The infected who recover earlier in a step are vaccinated for the later ones
+    expected = saved_from_vac(Simulation, range(30))
+    saved = saved_from_vac(ArraySimulation, range(100, 130))
+    error = np.sqrt(expected.var() / len(expected) + saved.var() / len(saved))
+    assert abs(saved.mean() - expected.mean()) < 4 * error
+
+def test_run(tmp_path, monkeypatch):
+    virus = Virus("Lassa", 0.09, 0.20)
+    #answers.txt is written to the working directory
+    monkeypatch.chdir(tmp_path)
+    logger = Logger(str(tmp_path / 'logs.txt'), str(tmp_path / 'logs_formatting.txt'))
+    sim = ArraySimulation(2000, 0.80, virus, logger=logger)
+    sim.run(plot=False)
+    assert os.path.exists(tmp_path / 'answers.txt')
+    assert sim.current_infected == 0
+    assert sim.total_dead <= sim.total_infected + sim.initial_infected
+
+def test_same_seed_same_run():
+    virus = Virus("Smallpox", 0.2, 0.15)
+    results = []
+    for seed in (5, 5, 6):
+        sim = ArraySimulation(1000, 0.50, virus, seed=seed, logger=quiet())
+        sim._create_population(sim.initial_infected)
+        while sim._simulation_should_continue():
+            sim.time_step()
+        results.append((sim.total_infected, sim.total_dead, sim.saved_from_vac))
+    assert results[0] == results[1]
+    assert results[0] != results[2]
+
+def test_counters_match_population():
+    virus = Virus("Smallpox", 0.2, 0.15)
+    sim = ArraySimulation(1000, 0.50, virus, chunk_size=7, logger=quiet())
+    sim._create_population(sim.initial_infected)
+    while sim._simulation_should_continue():
+        sim.time_step()
+        assert list(sim.infected_idx) == list(np.flatnonzero(sim.infected))
+        assert sim.current_infected == np.count_nonzero(sim.infected)
+        assert sim.total_dead == sim.pop_size - np.count_nonzero(sim.alive)
+        assert sim.total_vaccinated == np.count_nonzero(sim.alive & sim.vaccinated & ~sim.infected)
+
+def test_living_tracks_deaths():
+    virus = Virus("Ebola", 0.9, 0.25)
+    sim = ArraySimulation(2000, 0.10, virus, logger=quiet())
+    sim._create_population(sim.initial_infected)
+    while sim._simulation_should_continue():
+        sim.time_step()
+        assert list(np.sort(sim.living)) == list(np.flatnonzero(sim.alive))
+        assert list(sim.living_position[sim.living]) == list(range(len(sim.living)))
+    assert len(sim.living) == sim.pop_size - sim.total_dead
@@ -0,0 +1,239 @@
+''' Benchmarks of the simulation hot paths, with regression tracking.
+
+python3 benchmark.py run --output bench.json times _create_population, time_step,
+interaction and _infect_newly_infected of each engine over population sizes and
+vaccination/mortality regimes, and the Logger write methods, then writes the
+timings as JSON. python3 benchmark.py compare baseline.json bench.json lists every
+benchmark that got slower than the baseline by more than the threshold, and exits
+with status 1 if there are any.
+'''
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+from logger import Logger, LOG_NONE
+from person import Person
+from simulation import create_simulation
+
+SIZES = (1000, 10000, 100000, 1000000, 10000000)
+#Vaccination, mortality and reproduction rates of each regime
+REGIMES = {
+    'low_vacc_high_mortality': {'vacc_percentage': 0.1, 'mortality_rate': 0.7, 'repro_rate': 0.25},
+    'mid_vacc': {'vacc_percentage': 0.5, 'mortality_rate': 0.15, 'repro_rate': 0.06},
+    'high_vacc_low_mortality': {'vacc_percentage': 0.9, 'mortality_rate': 0.05, 'repro_rate': 0.06},
+}
+ENGINES = ('person', 'array')
+#Larger populations of Person objects take minutes and gigabytes to build
+MAX_SIZE = {'person': 1000000}
+#Share of the population infected at the start of the time_step benchmark
+INFECTED_FRACTION = 0.001
+#Interactions, infections and log events timed per repeat
+OPERATIONS = 10000
+THRESHOLD = 0.10
+
+
+def measure(setup, function, repeat):
+    '''Calls function(setup()) repeat times and returns the seconds each call took.
+    Only the call to function is timed.
+    '''
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        function(state)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def result(name, engine, regime, size, operations, times):
+    '''Returns the JSON record of one benchmark. Times are per repeat, in seconds.'''
+    median = statistics.median(times)
+    return {'key': f'{name}/{engine}/{regime}/{size}', 'name': name, 'engine': engine,
+        'regime': regime, 'size': size, 'operations': operations, 'repeats': len(times),
+        'median': median, 'best': min(times), 'per_operation': median / operations}
+
+
+def _simulation(engine, regime, size, initial_infected=10):
+    config = dict(REGIMES[regime], pop_size=size, virus_name='Benchmark',
+        initial_infected=initial_infected, engine=engine)
+    return create_simulation(config, logger=Logger(os.devnull, os.devnull, log_level=LOG_NONE))
+
+
+def _populated(engine, regime, size, initial_infected=10):
+    sim = _simulation(engine, regime, size, initial_infected)
+    sim._create_population(initial_infected)
+    return sim
+
+
+def _interact(sim):
+    '''Runs OPERATIONS interactions between random living people.'''
+    if sim.engine_name == 'array':
+        #The array engine runs the interactions of 100 contacts per infected person at once
+        positions = sim.rng.integers(0, len(sim.living), OPERATIONS // sim.interactions_per_person)
+        sim._interact_chunk(sim.living, positions)
+        return
+    for _ in range(OPERATIONS):
+        person = sim.living[sim.random.randrange(len(sim.living))]
+        sim.interaction(person, sim._sample_contact(person))
+
+
+def _newly_infected(sim):
+    '''Returns sim with OPERATIONS random ids set to be infected.'''
+    ids = sim.rng.choice(sim.pop_size, min(OPERATIONS, sim.pop_size), replace=False) + 1
+    if sim.engine_name == 'array':
+        sim.newly_infected = np.sort(ids)
+    else:
+        sim.newly_infected = set(ids.tolist())
+    return sim
+
+
+def bench_engine(engine, regime, size, repeat):
+    '''Returns the results of the engine benchmarks for one engine, regime and size.'''
+    infected = max(10, int(size * INFECTED_FRACTION))
+    results = [
+        result('create_population', engine, regime, size, size,
+            measure(lambda: _simulation(engine, regime, size),
+                lambda sim: sim._create_population(10), repeat)),
+        #Each repeat times the first time step, with INFECTED_FRACTION of people infected
+        result('time_step', engine, regime, size, infected,
+            measure(lambda: _populated(engine, regime, size, infected),
+                lambda sim: sim.time_step(), repeat)),
+    ]
+    #Every repeat starts from a new population, so infections and deaths do not pile up
+    results.append(result('interaction', engine, regime, size, OPERATIONS,
+        measure(lambda: _populated(engine, regime, size), _interact, repeat)))
+    results.append(result('infect_newly_infected', engine, regime, size,
+        min(OPERATIONS, size), measure(lambda: _newly_infected(_populated(engine, regime, size)),
+            lambda sim: sim._infect_newly_infected(), repeat)))
+    return results
+
+
+def bench_logger(directory, repeat):
+    '''Returns the results of the Logger write benchmarks, for every log format with
+    and without buffering. The engine of each result is the logger configuration.
+    '''
+    ids = np.arange(1, OPERATIONS + 1)
+    outcomes = (ids % 4).astype(np.uint8)
+    alive = ids % 2 == 0
+    people = [Person(id, False, None) for id in range(1, OPERATIONS + 2)]
+    file_name = os.path.join(directory, 'logs')
+
+    def logger(log_format, buffered):
+        def setup():
+            #Every repeat writes new files instead of appending to the last one's
+            for name in (file_name, file_name + '_formatting'):
+                if os.path.exists(name):
+                    os.remove(name)
+            log = Logger(file_name, file_name + '_formatting', buffered=buffered,
+                log_format=log_format)
+            log.write_metadata(OPERATIONS, 0.5, 'Benchmark', 0.15, 0.06, 10)
+            return log
+        return setup
+
+    def timed(write):
+        def run(log):
+            write(log)
+            log.close()
+        return run
+
+    writes = {
+        'log_interaction': lambda log: [log.log_interaction(people[i], people[i + 1], 'did_infect')
+            for i in range(OPERATIONS)],
+        'log_interactions': lambda log: log.log_interactions(ids, ids + 1, outcomes),
+        'log_infection_survival': lambda log: [log.log_infection_survival(person)
+            for person in people[:OPERATIONS]],
+        'log_infection_survivals': lambda log: log.log_infection_survivals(ids, alive),
+        'log_time_step': lambda log: [log.log_time_step(step, 0, 0, 0, 0, 0)
+            for step in range(OPERATIONS)],
+    }
+    results = []
+    for log_format in ('text', 'binary'):
+        for buffered in (False, True):
+            configuration = log_format + ('_buffered' if buffered else '')
+            for name, write in writes.items():
+                results.append(result(name, configuration, 'logger', OPERATIONS, OPERATIONS,
+                    measure(logger(log_format, buffered), timed(write), repeat)))
+    return results
+
+
+def run_benchmarks(sizes=SIZES, regimes=tuple(REGIMES), engines=ENGINES, repeat=3,
+    logger=True):
+    '''Runs every benchmark and returns the results as a JSON-ready dict. Sizes above
+    an engine's MAX_SIZE are skipped for that engine.
+    '''
+    results = []
+    for engine in engines:
+        for size in sizes:
+            if size > MAX_SIZE.get(engine, size):
+                continue
+            for regime in regimes:
+                results.extend(bench_engine(engine, regime, size, repeat))
+    if logger:
+        directory = tempfile.mkdtemp()
+        try:
+            results.extend(bench_logger(directory, repeat))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return {'machine': {'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'processor': platform.processor()},
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'repeat': repeat, 'results': results}
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    '''Compares the per-operation median times of the benchmarks in both runs.
+    Returns (key, baseline, current, ratio) for every benchmark they share, and the
+    list of those whose ratio is above 1 + threshold.
+    '''
+    old = {record['key']: record for record in baseline['results']}
+    rows = []
+    for record in current['results']:
+        if record['key'] in old:
+            before = old[record['key']]['per_operation']
+            after = record['per_operation']
+            rows.append((record['key'], before, after, after / before if before else float('inf')))
+    return rows, [row for row in rows if row[3] > 1 + threshold]
+
+
+if __name__ == "__main__":
+    #python3 benchmark.py run --sizes 1000 100000 --output bench.json
+    #python3 benchmark.py compare baseline.json bench.json
+    parser = argparse.ArgumentParser(description='Benchmarks of the simulation hot paths.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--sizes', type=lambda size: int(float(size)), nargs='+',
+        default=list(SIZES), help='population sizes, 1e5 style is accepted')
+    run_parser.add_argument('--regimes', nargs='+', choices=list(REGIMES), default=list(REGIMES))
+    run_parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES))
+    run_parser.add_argument('--repeat', type=int, default=3, help='timed runs of each benchmark')
+    run_parser.add_argument('--no-logger', action='store_true', help='skip the Logger benchmarks')
+    run_parser.add_argument('--output', default='bench.json')
+    compare_parser = commands.add_parser('compare', help='flag regressions against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=THRESHOLD,
+        help='slowdown allowed before a benchmark is flagged, 0.10 is 10%%')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run_benchmarks(args.sizes, args.regimes, args.engines, args.repeat,
+            not args.no_logger)
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=1)
+        for record in results['results']:
+            print(f"{record['key']:<60} {record['median'] * 1000:10.3f} ms "
+                f"{record['per_operation'] * 1e6:10.3f} us/op")
+    else:
+        with open(args.baseline) as baseline, open(args.current) as current:
+            rows, regressions = compare(json.load(baseline), json.load(current), args.threshold)
+        for key, before, after, ratio in rows:
+            flag = ' REGRESSION' if ratio > 1 + args.threshold else ''
+            print(f'{key:<60} {before * 1e6:10.3f} -> {after * 1e6:10.3f} us/op {ratio:6.2f}x{flag}')
+        print(f'{len(regressions)} of {len(rows)} benchmarks regressed')
+        sys.exit(1 if regressions else 0)
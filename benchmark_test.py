@@ -0,0 +1,26 @@
+import random, sys
+random.seed(42)
+from benchmark import run_benchmarks, compare
+import pytest
+
+
+def test_run_benchmarks():
+    results = run_benchmarks(sizes=(500,), regimes=('mid_vacc',), repeat=1, logger=False)
+    keys = [record['key'] for record in results['results']]
+    assert len(keys) == len(set(keys)) == 8
+    assert 'time_step/array/mid_vacc/500' in keys
+    assert all(record['per_operation'] > 0 for record in results['results'])
+
+def test_run_benchmarks_skips_large_person_populations():
+    results = run_benchmarks(sizes=(2000000,), regimes=('mid_vacc',), engines=('person',),
+        repeat=1, logger=False)
+    assert results['results'] == []
+
+def test_compare_flags_regressions():
+    baseline = {'results': [{'key': 'a', 'per_operation': 1.0}, {'key': 'b', 'per_operation': 1.0},
+        {'key': 'old', 'per_operation': 1.0}]}
+    current = {'results': [{'key': 'a', 'per_operation': 1.05}, {'key': 'b', 'per_operation': 1.5},
+        {'key': 'new', 'per_operation': 1.0}]}
+    rows, regressions = compare(baseline, current, threshold=0.1)
+    assert [row[0] for row in rows] == ['a', 'b']
+    assert [row[0] for row in regressions] == ['b']
@@ -0,0 +1,98 @@
+''' Checkpoints of a running Simulation, so a long run can resume where it stopped.
+
+A checkpoint is a directory holding state.json, with the simulation inputs, counters,
+plot series and random generator states, and one .npy file per population array.
+The .npy files are raw array dumps, cheap to write and memory-mappable to read.
+'''
+
+import json
+import os
+import shutil
+import numpy as np
+import rotating_log
+import simulation
+
+STATE_FILE = 'state.json'
+#Simulation attributes saved as they are
+COUNTERS = ('total_infected', 'current_infected', 'total_dead', 'total_vaccinated',
+    'saved_from_vac', 'time_step_counter', 'plot_y', 'plot_y2')
+
+
+def save_checkpoint(sim, directory):
+    '''Saves the state of sim to directory, replacing any earlier checkpoint there.
+    The checkpoint is written next to directory first and then renamed into place,
+    so a crash while saving leaves the previous checkpoint intact.
+    '''
+    #The log has to hold exactly the steps the checkpoint has run
+    sim.logger.flush()
+    log_size = log_segment = None
+    if sim.logger.compress:
+        #Compressed logs are cut between segments, later steps start a new one
+        log_segment = sim.logger._open_handle().end_segment()
+    elif sim.logger.logs_summary and os.path.exists(sim.logger.file_name):
+        log_size = os.path.getsize(sim.logger.file_name)
+    state = {
+        'config': sim.config(),
+        'seed': sim.seed if isinstance(sim.seed, int) else None,
+        'seed_sequence': {'entropy': sim.seed_sequence.entropy,
+            'spawn_key': list(sim.seed_sequence.spawn_key),
+            'n_children_spawned': sim.seed_sequence.n_children_spawned},
+        'rng_state': sim.rng.bit_generator.state,
+        'random_state': sim.random.getstate(),
+        'counters': {name: getattr(sim, name) for name in COUNTERS},
+        'log': {'file_name': sim.logger.file_name, 'size': log_size, 'segment': log_segment,
+            'step': sim.logger.step, 'sample_count': sim.logger._sample_count},
+    }
+    temporary = directory.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    for name, array in sim._population_state().items():
+        np.save(os.path.join(temporary, name + '.npy'), array)
+    with open(os.path.join(temporary, STATE_FILE), 'w') as state_file:
+        json.dump(state, state_file)
+    #Swaps the new checkpoint in, then drops the old one
+    previous = directory.rstrip(os.sep) + '.old'
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(directory):
+        os.rename(directory, previous)
+    os.rename(temporary, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def load_checkpoint(directory, logger=None):
+    '''Returns a Simulation restored from the checkpoint in directory. Calling run()
+    on it continues exactly where the checkpointed run was.
+
+    The log is appended to. If it is the log the checkpointed run wrote, anything
+    logged after the checkpoint is cut off first so no step is logged twice.
+    '''
+    with open(os.path.join(directory, STATE_FILE)) as state_file:
+        state = json.load(state_file)
+    sim = simulation.create_simulation(state['config'], logger=logger, seed=state['seed'],
+        resume=True)
+    sim.seed_sequence = np.random.SeedSequence(state['seed_sequence']['entropy'],
+        spawn_key=state['seed_sequence']['spawn_key'],
+        n_children_spawned=state['seed_sequence']['n_children_spawned'])
+    sim.rng.bit_generator.state = state['rng_state']
+    version, internal_state, gauss_next = state['random_state']
+    sim.random.setstate((version, tuple(internal_state), gauss_next))
+    for name, value in state['counters'].items():
+        setattr(sim, name, value)
+
+    arrays = {}
+    for file_name in os.listdir(directory):
+        if file_name.endswith('.npy'):
+            arrays[file_name[:-4]] = np.load(os.path.join(directory, file_name), mmap_mode='r')
+    sim._restore_population_state(arrays)
+
+    log = state['log']
+    if (log['size'] is not None and sim.logger.file_name == log['file_name']
+        and os.path.exists(log['file_name'])):
+        os.truncate(log['file_name'], log['size'])
+    if log.get('segment') is not None and sim.logger.file_name == log['file_name']:
+        #Segments written after the checkpoint are dropped, their numbers can be reused
+        sim.logger.close()
+        rotating_log.truncate(log['file_name'], log['segment'])
+    sim.logger.step = log['step']
+    sim.logger._sample_count = log['sample_count']
+    return sim
@@ -0,0 +1,85 @@
+import random, sys
+random.seed(42)
+import os
+import numpy as np
+from logger import Logger, LOG_NONE
+from virus import Virus
+from simulation import Simulation
+from array_simulation import ArraySimulation
+from aggregate_simulation import AggregateSimulation
+from network_simulation import NetworkSimulation
+from sharded_simulation import ShardedSimulation
+from kernel_simulation import KernelSimulation
+from compact_simulation import CompactSimulation
+from checkpoint import save_checkpoint, load_checkpoint
+from rotating_log import LogReader
+import pytest
+
+
+def run_until(sim, steps):
+    '''Runs up to steps time steps, keeping the plot series like Simulation.run does.'''
+    sim._start()
+    for stats in sim.iter_steps():
+        sim.plot_y.append(stats.current_infected)
+        sim.plot_y2.append(stats.total_dead)
+        if stats.step == steps:
+            break
+
+@pytest.mark.parametrize('engine', [Simulation, ArraySimulation, AggregateSimulation,
+    NetworkSimulation, ShardedSimulation, KernelSimulation, CompactSimulation])
+def test_resume_continues_exactly(engine, tmp_path):
+    virus = Virus("Smallpox", 0.2, 0.15)
+    quiet = Logger(os.devnull, os.devnull, log_level=LOG_NONE)
+    expected = engine(500, 0.5, virus, logger=quiet, seed=3)
+    expected.run(plot=False)
+
+    sim = engine(500, 0.5, virus, logger=quiet, seed=3)
+    run_until(sim, 2)
+    save_checkpoint(sim, str(tmp_path / 'checkpoint'))
+    resumed = load_checkpoint(str(tmp_path / 'checkpoint'), logger=quiet)
+    assert type(resumed).__name__ == engine.__name__
+    resumed.run(plot=False)
+    assert resumed.plot_y == expected.plot_y
+    assert resumed.plot_y2 == expected.plot_y2
+    assert resumed.saved_from_vac == expected.saved_from_vac
+
+def test_resume_truncates_log(tmp_path):
+    virus = Virus("Smallpox", 0.2, 0.15)
+    log_name = str(tmp_path / 'logs.txt')
+    sim = ArraySimulation(300, 0.5, virus, logger=Logger(log_name, os.devnull), seed=3)
+    run_until(sim, 1)
+    save_checkpoint(sim, str(tmp_path / 'checkpoint'))
+    size = os.path.getsize(log_name)
+    run_until(sim, 2)
+    assert os.path.getsize(log_name) > size
+    load_checkpoint(str(tmp_path / 'checkpoint'), logger=Logger(log_name, os.devnull))
+    assert os.path.getsize(log_name) == size
+
+def test_resume_truncates_compressed_log(tmp_path):
+    virus = Virus("Smallpox", 0.2, 0.15)
+    expected_name, log_name = str(tmp_path / 'expected.txt'), str(tmp_path / 'logs.txt')
+    ArraySimulation(300, 0.5, virus, logger=Logger(expected_name, os.devnull, compress=True),
+        seed=3).run(plot=False)
+    sim = ArraySimulation(300, 0.5, virus, logger=Logger(log_name, os.devnull, compress=True),
+        seed=3)
+    run_until(sim, 1)
+    save_checkpoint(sim, str(tmp_path / 'checkpoint'))
+    #Steps logged after the checkpoint, and never closed, as if the run crashed
+    run_until(sim, 3)
+    sim.logger.flush()
+    resumed = load_checkpoint(str(tmp_path / 'checkpoint'),
+        logger=Logger(log_name, os.devnull, compress=True))
+    resumed.run(plot=False)
+    #The resumed log holds every step once, like a run that never stopped
+    assert (b''.join(LogReader(log_name).iter_from(1)) ==
+        b''.join(LogReader(expected_name).iter_from(1)))
+
+def test_checkpoint_arrays_are_npy(tmp_path):
+    virus = Virus("Smallpox", 0.2, 0.15)
+    sim = ArraySimulation(300, 0.5, virus, logger=Logger(os.devnull, os.devnull,
+        log_level=LOG_NONE))
+    sim._create_population(sim.initial_infected)
+    save_checkpoint(sim, str(tmp_path / 'checkpoint'))
+    alive = np.load(str(tmp_path / 'checkpoint' / 'alive.npy'), mmap_mode='r')
+    assert isinstance(alive, np.memmap)
+    assert len(alive) == 300
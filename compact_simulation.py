@@ -0,0 +1,76 @@
+import array
+import numpy as np
+from simulation import Simulation
+from population import PopulationStore, INFECTED, seed_population
+
+
+class CompactSimulation(Simulation):
+    ''' Simulation engine that runs the person engine's rules with its population in a
+    PopulationStore, one state code byte per person, instead of a list of Person objects.
+
+    Simulation.time_step, interaction and _resolve_infection see PersonView objects,
+    which are only made for the infected and their contacts. living and
+    living_position hold slots in Python arrays, 4 bytes each below two billion
+    people, so a person costs 9 bytes where a Person object and its list entries cost
+    a couple of hundred.
+    The same seed gives exactly the same run as the person engine.
+    '''
+    engine_name = 'compact'
+
+    def _slot_array(self, slots):
+        '''Returns a Python array of the smallest integer type that holds every slot,
+        filled from a NumPy array of slots.
+        '''
+        dtype, typecode = (np.int32, 'i') if self.pop_size < 2 ** 31 else (np.int64, 'q')
+        slot_array = array.array(typecode)
+        slot_array.frombytes(slots.astype(dtype).tobytes())
+        return slot_array
+
+    def _create_population(self, initial_infected):
+        '''Creates the population store, seeded like Simulation._create_population.'''
+        amount_vaccinated = int(self.vacc_percentage * self.pop_size)
+        vaccinated, infected = seed_population(self.rng, self.pop_size, amount_vaccinated,
+            initial_infected)
+        self.population = PopulationStore.from_masks(np.ones(self.pop_size, dtype=bool),
+            vaccinated, infected, self.virus)
+        infected_slots = np.flatnonzero(infected).tolist()
+        self.infected_people = [self.population[slot] for slot in infected_slots]
+        self.newly_infected = set(slot + 1 for slot in infected_slots)
+        self.current_infected += len(infected_slots)
+        self.total_vaccinated += amount_vaccinated - int(np.count_nonzero(vaccinated[infected_slots]))
+        self.living = self._slot_array(np.arange(self.pop_size))
+        self.living_position = self._slot_array(np.arange(self.pop_size))
+
+    def _population_state(self):
+        '''Returns the population as a dict of NumPy arrays, for checkpoints.'''
+        return {'states': self.population.states, 'living': np.array(self.living, dtype=np.int64)}
+
+    def _restore_population_state(self, arrays):
+        '''Restores the population store and living from a checkpoint.'''
+        self.population = PopulationStore(np.array(arrays['states'], dtype=np.uint8), self.virus)
+        infected_slots = np.flatnonzero(self.population.mask(INFECTED))
+        self.infected_people = [self.population[slot] for slot in infected_slots.tolist()]
+        living = np.array(arrays['living'], dtype=np.int64)
+        living_position = np.zeros(self.pop_size, dtype=np.int64)
+        living_position[living] = np.arange(len(living))
+        self.living = self._slot_array(living)
+        self.living_position = self._slot_array(living_position)
+
+    def _remove_living(self, person):
+        '''Removes a person who died from living, moving the last living person into
+        their place like Simulation._remove_living.
+        '''
+        position = self.living_position[person.slot]
+        last = self.living.pop()
+        if last != person.slot:
+            self.living[position] = last
+            self.living_position[last] = position
+
+    def _sample_contact(self, person):
+        '''Returns a view of a random living person other than person, drawn like
+        Simulation._sample_contact.
+        '''
+        position = self.random.randrange(len(self.living) - 1)
+        if position >= self.living_position[person.slot]:
+            position += 1
+        return self.population[self.living[position]]
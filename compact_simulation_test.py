@@ -0,0 +1,41 @@
+import random, sys
+random.seed(42)
+import os
+import numpy as np
+from logger import Logger, LOG_NONE
+from virus import Virus
+from simulation import Simulation
+from compact_simulation import CompactSimulation
+from population import ALIVE, VACCINATED, INFECTED
+import pytest
+
+
+def test_create_population():
+    virus = Virus("Smallpox", 0.06, 0.15)
+    sim = CompactSimulation(100, 0.90, virus)
+    sim._create_population(sim.initial_infected)
+    assert len(sim.population) == 100
+    assert np.count_nonzero(sim.population.mask(VACCINATED)) == 90
+    assert np.count_nonzero(sim.population.mask(INFECTED)) == sim.initial_infected
+    assert [person._id for person in sim.infected_people] == sorted(sim.newly_infected)
+    assert len(sim.living) == 100
+
+def test_same_run_as_person_engine():
+    #Same seeding and the same draws in the same order as Simulation
+    virus = Virus("Smallpox", 0.2, 0.15)
+    runs = []
+    for engine in (Simulation, CompactSimulation):
+        sim = engine(2000, 0.50, virus, logger=Logger(os.devnull, os.devnull,
+            log_level=LOG_NONE), seed=7)
+        runs.append(list(sim.iter_steps()))
+    assert runs[0] == runs[1]
+
+def test_living_tracks_deaths():
+    virus = Virus("Ebola", 0.9, 0.25)
+    sim = CompactSimulation(2000, 0.10, virus, logger=Logger(os.devnull, os.devnull,
+        log_level=LOG_NONE))
+    for _ in sim.iter_steps():
+        alive = np.flatnonzero(sim.population.mask(ALIVE))
+        assert sorted(sim.living) == list(alive)
+        assert all(sim.living[sim.living_position[slot]] == slot for slot in alive)
+    assert len(sim.living) == sim.pop_size - sim.total_dead
@@ -0,0 +1,205 @@
+import argparse
+import contextlib
+import functools
+import io
+import json
+import multiprocessing
+import os
+import statistics
+import numpy as np
+from logger import Logger, LOG_NONE
+from simulation import add_simulation_arguments, check_simulation_arguments, simulation_config, \
+    create_simulation
+
+#Final values of every replicate that get summarized
+METRICS = ('total_infected', 'total_dead', 'saved_from_vac', 'steps')
+#Per-step series of every replicate that get summarized
+CURVES = ('current_infected', 'total_dead')
+QUANTILES = (0.05, 0.5, 0.95)
+#Metrics run_adaptive can target besides METRICS, as a fraction of the population
+FRACTIONS = {'infected_fraction': 'total_infected', 'dead_fraction': 'total_dead'}
+#Widths of the confidence intervals run_adaptive aims for by default
+DEFAULT_TARGETS = {'infected_fraction': 0.02, 'dead_fraction': 0.01}
+
+
+def run_replicate(config, seed, logger=None):
+    '''Runs one Simulation of config with the given seed, without logs, plots or
+    printing unless a logger is passed in. Returns its final metrics and per-step
+    curves as a dict.
+    '''
+    if logger is None:
+        logger = Logger(os.devnull, os.devnull, log_level=LOG_NONE)
+    sim = create_simulation(config, logger=logger, seed=seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.run(plot=False)
+    return {'seed': seed, 'total_infected': sim.total_infected, 'total_dead': sim.total_dead,
+        'saved_from_vac': sim.saved_from_vac, 'steps': sim.time_step_counter,
+        'current_infected_curve': sim.plot_y, 'total_dead_curve': sim.plot_y2}
+
+
+def run_replicates(config, seeds, processes=None, pool=None):
+    '''Runs one replicate per seed, over a pool of processes when there is more than
+    one, or over pool if one is given. Results come back in the order of seeds.
+    '''
+    replicate = functools.partial(run_replicate, config)
+    if pool is not None:
+        return pool.map(replicate, seeds, chunksize=1)
+    if processes == 1 or len(seeds) <= 1:
+        return [replicate(seed) for seed in seeds]
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(replicate, seeds, chunksize=1)
+
+
+def summarize_values(values):
+    '''Returns the mean, standard deviation and QUANTILES of a list of numbers.'''
+    values = np.asarray(values, dtype=float)
+    summary = {'mean': float(values.mean()), 'std': float(values.std())}
+    for quantile, value in zip(QUANTILES, np.quantile(values, QUANTILES)):
+        summary[f'q{int(quantile * 100):02d}'] = float(value)
+    return summary
+
+
+def summarize(results):
+    '''Summarizes replicate results into mean/quantile summaries of each metric, and
+    of each curve at every step. Replicates that ended early keep their final value
+    for the later steps.
+    '''
+    summary = {'replicates': len(results),
+        'metrics': {metric: summarize_values([result[metric] for result in results])
+            for metric in METRICS},
+        'curves': {}}
+    steps = max(len(result['current_infected_curve']) for result in results)
+    for curve in CURVES:
+        padded = np.array([np.pad(result[f'{curve}_curve'],
+            (0, steps - len(result[f'{curve}_curve'])), mode='edge') for result in results],
+            dtype=float)
+        summary['curves'][curve] = {'mean': padded.mean(axis=0).tolist()}
+        for quantile, values in zip(QUANTILES, np.quantile(padded, QUANTILES, axis=0)):
+            summary['curves'][curve][f'q{int(quantile * 100):02d}'] = values.tolist()
+    return summary
+
+
+def run_ensemble(config, replicates, processes=None, base_seed=0):
+    '''Runs replicates copies of the Simulation described by config, seeded
+    base_seed, base_seed + 1 and so on, and returns their summary.
+    '''
+    seeds = list(range(base_seed, base_seed + replicates))
+    summary = summarize(run_replicates(config, seeds, processes))
+    summary['config'] = config
+    summary['seeds'] = seeds
+    return summary
+
+
+def metric_values(results, config, metric):
+    '''Returns the values of a metric of METRICS or FRACTIONS in every result.'''
+    check_metric(metric)
+    if metric in FRACTIONS:
+        return [result[FRACTIONS[metric]] / config['pop_size'] for result in results]
+    return [result[metric] for result in results]
+
+
+def check_metric(metric):
+    '''Raises ValueError unless metric is in METRICS or FRACTIONS.'''
+    if metric not in METRICS and metric not in FRACTIONS:
+        raise ValueError(f'Unknown metric {metric!r}, use one of '
+            f'{", ".join(list(METRICS) + list(FRACTIONS))}')
+
+
+def interval_widths(results, config, metrics, confidence=0.95):
+    '''Returns the width of the normal confidence interval of the mean of each
+    metric over results, which needs at least two results.
+    '''
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    return {metric: 2 * z * statistics.stdev(metric_values(results, config, metric))
+        / len(results) ** 0.5 for metric in metrics}
+
+
+def run_adaptive(config, targets=None, min_replicates=10, max_replicates=500, batch_size=None,
+    processes=None, base_seed=0, confidence=0.95, runner=None):
+    ''' Runs replicates of config, seeded base_seed, base_seed + 1 and so on, until the
+    confidence interval of the mean of every metric in targets is no wider than its
+    target, or max_replicates have run. Easy points stop after min_replicates.
+
+    Replicates run batch_size at a time, by default one per process. runner can
+    replace how a batch is run: it is called with a list of seeds and returns their
+    results. Returns the summary of the replicates that ran, with their seeds, the
+    final interval widths and whether every target was met.
+    '''
+    #An interval needs at least two replicates
+    if not 2 <= min_replicates <= max_replicates:
+        raise ValueError('Need 2 <= min_replicates <= max_replicates, not '
+            f'{min_replicates} and {max_replicates}')
+    targets = DEFAULT_TARGETS if targets is None else targets
+    batch_size = batch_size or processes or os.cpu_count()
+    with contextlib.ExitStack() as stack:
+        if runner is None:
+            pool = None
+            if processes != 1:
+                pool = stack.enter_context(multiprocessing.Pool(processes))
+            runner = lambda seeds: run_replicates(config, seeds, processes, pool)
+        results = []
+        while True:
+            count = min_replicates - len(results) if len(results) < min_replicates else batch_size
+            count = min(count, max_replicates - len(results))
+            seed = base_seed + len(results)
+            results.extend(runner(list(range(seed, seed + count))))
+            widths = interval_widths(results, config, targets, confidence)
+            converged = all(widths[metric] <= target for metric, target in targets.items())
+            if converged or len(results) >= max_replicates:
+                break
+    summary = summarize(results)
+    summary['config'] = config
+    summary['seeds'] = [result['seed'] for result in results]
+    summary['interval_widths'] = widths
+    summary['converged'] = converged
+    return summary
+
+
+def parse_targets(values):
+    '''Parses METRIC=WIDTH strings from the command line into a targets dict.'''
+    targets = {}
+    for value in values:
+        metric, _, width = value.partition('=')
+        check_metric(metric)
+        targets[metric] = float(width)
+    return targets
+
+
+if __name__ == "__main__":
+    #python3 ensemble.py 5000 0.80 Smallpox 0.15 0.06 10 --replicates 100
+    parser = argparse.ArgumentParser(description='Runs many replicates of a simulation.')
+    add_simulation_arguments(parser)
+    parser.add_argument('--replicates', type=int, default=None,
+        help='replicates to run, 100 by default, or the least to run with --target, 10 by default')
+    parser.add_argument('--processes', type=int, default=None,
+        help='worker processes, defaults to one per core')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first replicate')
+    parser.add_argument('--output', default=None, help='write the summary JSON here')
+    parser.add_argument('--target', action='append', default=None, metavar='METRIC=WIDTH',
+        help='keep adding replicates until the confidence interval of METRIC is at most '
+        'WIDTH wide, --replicates is then the least to run. infected_fraction and '
+        'dead_fraction are shares of the population. Can be repeated.')
+    parser.add_argument('--max-replicates', type=int, default=500,
+        help='most replicates to run with --target')
+    parser.add_argument('--confidence', type=float, default=0.95,
+        help='confidence level of the --target intervals')
+    args = parser.parse_args()
+    check_simulation_arguments(parser, args)
+
+    if args.target:
+        summary = run_adaptive(simulation_config(args), parse_targets(args.target),
+            args.replicates or 10, args.max_replicates, processes=args.processes,
+            base_seed=args.seed, confidence=args.confidence)
+        print(f"Ran {summary['replicates']} replicates, "
+            f"{'every target was met' if summary['converged'] else 'some targets were not met'}")
+        for metric, width in summary['interval_widths'].items():
+            print(f'{metric}: {args.confidence:.0%} interval width {width:.4f}')
+    else:
+        summary = run_ensemble(simulation_config(args), args.replicates or 100, args.processes,
+            args.seed)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(summary, output)
+    for metric, values in summary['metrics'].items():
+        print(f"{metric}: mean {values['mean']:.2f}, 5% {values['q05']:.2f}, "
+            f"median {values['q50']:.2f}, 95% {values['q95']:.2f}")
@@ -0,0 +1,62 @@
+import random, sys
+random.seed(42)
+import numpy as np
+from ensemble import run_replicate, run_ensemble, summarize, run_adaptive, interval_widths
+import pytest
+
+CONFIG = {'pop_size': 500, 'vacc_percentage': 0.5, 'virus_name': 'Smallpox',
+    'mortality_rate': 0.15, 'repro_rate': 0.06, 'initial_infected': 10, 'engine': 'array'}
+
+
+def test_run_replicate_is_seeded():
+    first = run_replicate(CONFIG, 7)
+    second = run_replicate(CONFIG, 7)
+    assert first == second
+    assert len(first['current_infected_curve']) == first['steps'] + 1
+
+def test_summarize_pads_curves():
+    results = [
+        {'total_infected': 1, 'total_dead': 0, 'saved_from_vac': 2, 'steps': 1,
+            'current_infected_curve': [1, 0], 'total_dead_curve': [0, 0]},
+        {'total_infected': 3, 'total_dead': 2, 'saved_from_vac': 4, 'steps': 2,
+            'current_infected_curve': [1, 2, 0], 'total_dead_curve': [0, 1, 2]},
+    ]
+    summary = summarize(results)
+    assert summary['metrics']['total_infected']['mean'] == 2
+    assert summary['curves']['total_dead']['mean'] == [0, 0.5, 1]
+    assert summary['curves']['current_infected']['q50'] == [1, 1, 0]
+
+def test_run_ensemble_over_processes():
+    summary = run_ensemble(CONFIG, 4, processes=2, base_seed=3)
+    assert summary['replicates'] == 4
+    assert summary['seeds'] == [3, 4, 5, 6]
+    serial = run_ensemble(CONFIG, 4, processes=1, base_seed=3)
+    assert summary['metrics'] == serial['metrics']
+
+def test_run_adaptive_stops_when_narrow():
+    summary = run_adaptive(CONFIG, {'infected_fraction': 1.0}, min_replicates=3, processes=1)
+    assert summary['converged']
+    assert summary['replicates'] == 3
+    assert summary['seeds'] == [0, 1, 2]
+
+def test_run_adaptive_budget():
+    summary = run_adaptive(CONFIG, {'total_dead': 0.0}, min_replicates=3, max_replicates=7,
+        batch_size=3, processes=1, base_seed=5)
+    assert not summary['converged']
+    assert summary['seeds'] == list(range(5, 12))
+    assert summary['interval_widths']['total_dead'] > 0
+
+def test_interval_widths():
+    results = [{'total_infected': 100}, {'total_infected': 300}]
+    widths = interval_widths(results, {'pop_size': 1000}, ['infected_fraction', 'total_infected'])
+    #Standard deviation of 141.4 over sqrt(2) replicates, times 2 * 1.96
+    assert widths['total_infected'] == pytest.approx(392, rel=0.01)
+    assert widths['infected_fraction'] == pytest.approx(0.392, rel=0.01)
+    with pytest.raises(ValueError):
+        interval_widths(results, {'pop_size': 1000}, ['infected'])
+
+def test_run_adaptive_needs_two_replicates():
+    for min_replicates, max_replicates in [(1, 10), (2, 1), (5, 3)]:
+        with pytest.raises(ValueError):
+            run_adaptive(CONFIG, min_replicates=min_replicates, max_replicates=max_replicates,
+                processes=1)
@@ -0,0 +1,147 @@
+''' Compact binary event log written by Logger(log_format='binary').
+
+The file starts with a header holding the write_metadata parameters, padded to a
+multiple of 16 bytes, followed by fixed-width 13 byte records of
+(step, source id, target id, outcome code). The records can be memory-mapped
+straight into a NumPy structured array with EventLog(file_name).events.
+
+Interactions are logged with the person as source and the random person as target.
+Survivals are logged with the person as both source and target. The summary of a time
+step is logged as four records that carry the log_time_step counts in place of ids.
+The cumulative totals can pass 2**32 on large runs, so they are 64 bit: the low 32 bits
+go in the step_infected and step_dead records and the high 32 bits in step_high.
+Version 1 logs have no step_high record.
+'''
+
+import struct
+import sys
+import numpy as np
+
+MAGIC = b'HISEVLOG'
+VERSION = 2
+#Versions EventLog can read
+VERSIONS = (1, 2)
+HEADER = struct.Struct('<8sHHIQdddQ')
+RECORD = struct.Struct('<IIIB')
+EVENT_DTYPE = np.dtype([('step', '<u4'), ('source', '<u4'), ('target', '<u4'),
+    ('outcome', 'u1')])
+
+#Outcome codes, the first four match the results of Simulation.interaction
+OUTCOMES = ('is_vaccinated', 'is_not_sick', 'did_infect', 'did_not_infect',
+    'survived', 'died', 'step_infected', 'step_dead', 'step_new', 'step_high')
+OUTCOME_CODES = {outcome: code for code, outcome in enumerate(OUTCOMES)}
+SURVIVED = OUTCOME_CODES['survived']
+DIED = OUTCOME_CODES['died']
+STEP_INFECTED = OUTCOME_CODES['step_infected'] # source current_infected, target total_infected
+STEP_DEAD = OUTCOME_CODES['step_dead'] # source dead_this_step, target total_dead
+STEP_NEW = OUTCOME_CODES['step_new'] # source newly_infected
+STEP_HIGH = OUTCOME_CODES['step_high'] # high 32 bits of total_infected and total_dead
+LOW_BITS = 0xFFFFFFFF
+
+
+def encode_header(pop_size, vacc_percentage, virus_name, mortality_rate, repro_num,
+    initial_infected):
+    '''Returns the file header holding the write_metadata parameters.'''
+    name = virus_name.encode('utf-8')
+    header_size = -(-(HEADER.size + len(name)) // 16) * 16
+    header = HEADER.pack(MAGIC, VERSION, len(name), header_size, pop_size,
+        vacc_percentage, mortality_rate, repro_num, initial_infected) + name
+    return header.ljust(header_size, b'\0')
+
+
+def encode_event(step, source, target, outcome):
+    '''Returns one event record.'''
+    return RECORD.pack(step, source, target, outcome)
+
+
+def encode_events(step, sources, targets, outcomes):
+    '''Returns the records for arrays of sources, targets and outcomes in one step.'''
+    events = np.empty(len(sources), dtype=EVENT_DTYPE)
+    events['step'] = step
+    events['source'] = sources
+    events['target'] = targets
+    events['outcome'] = outcomes
+    return events.tobytes()
+
+
+def encode_time_step(time_step_number, total_dead, current_infected, total_infected,
+    newly_infected, dead_this_step):
+    '''Returns the four summary records for the end of a time step.'''
+    return (RECORD.pack(time_step_number, current_infected, total_infected & LOW_BITS,
+            STEP_INFECTED)
+        + RECORD.pack(time_step_number, dead_this_step, total_dead & LOW_BITS, STEP_DEAD)
+        + RECORD.pack(time_step_number, total_infected >> 32, total_dead >> 32, STEP_HIGH)
+        + RECORD.pack(time_step_number, newly_infected, 0, STEP_NEW))
+
+
+class EventLog(object):
+    ''' Reads a binary event log. '''
+
+    def __init__(self, file_name):
+        ''' Reads the header into metadata and memory-maps the records into events.
+        A record cut short by an interrupted write is ignored.
+        '''
+        self.file_name = file_name
+        with open(file_name, 'rb') as log:
+            fixed = log.read(HEADER.size)
+            if len(fixed) < HEADER.size or fixed[:len(MAGIC)] != MAGIC:
+                raise ValueError(f'{file_name} is not a binary event log')
+            (_, version, name_len, self.header_size, pop_size, vacc_percentage,
+                mortality_rate, repro_num, initial_infected) = HEADER.unpack(fixed)
+            if version not in VERSIONS:
+                raise ValueError(f'{file_name} has unsupported event log version {version}')
+            virus_name = log.read(name_len).decode('utf-8')
+            log.seek(0, 2)
+            count = (log.tell() - self.header_size) // EVENT_DTYPE.itemsize
+        self.metadata = {'pop_size': pop_size, 'vacc_percentage': vacc_percentage,
+            'virus_name': virus_name, 'mortality_rate': mortality_rate,
+            'repro_num': repro_num, 'initial_infected': initial_infected}
+        if count > 0:
+            self.events = np.memmap(file_name, dtype=EVENT_DTYPE, mode='r',
+                offset=self.header_size, shape=(count,))
+        else:
+            self.events = np.empty(0, dtype=EVENT_DTYPE)
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        return self.iter_events()
+
+    def iter_events(self, chunk_size=65536):
+        '''Yields (step, source, target, outcome) tuples, reading chunk_size at a time.'''
+        for start in range(0, len(self.events), chunk_size):
+            yield from self.events[start:start + chunk_size].tolist()
+
+    def iter_text(self):
+        '''Yields the log rendered in the text format Logger writes.'''
+        from logger import Logger, INTERACTION_MESSAGES
+        yield Logger.metadata_text(**self.metadata)
+        summary = {}
+        for step, source, target, outcome in self.iter_events():
+            if outcome < SURVIVED:
+                yield INTERACTION_MESSAGES[OUTCOMES[outcome]].format(source, target)
+            elif outcome <= DIED:
+                yield Logger.survival_text(source, outcome == SURVIVED)
+            elif outcome == STEP_INFECTED:
+                summary['current_infected'], summary['total_infected'] = source, target
+            elif outcome == STEP_DEAD:
+                summary['dead_this_step'], summary['total_dead'] = source, target
+            elif outcome == STEP_HIGH:
+                summary['total_infected'] += source << 32
+                summary['total_dead'] += target << 32
+            elif outcome == STEP_NEW:
+                yield Logger.time_step_text(step, newly_infected=source, **summary)
+                summary = {}
+
+    def write_text(self, file_name):
+        '''Renders the whole log into a text file.'''
+        with open(file_name, 'w') as logs:
+            logs.writelines(self.iter_text())
+
+
+if __name__ == "__main__":
+    #python3 event_log.py logs.bin > logs.txt
+    if len(sys.argv) != 2:
+        sys.exit('usage: python3 event_log.py <binary log file>')
+    sys.stdout.writelines(EventLog(sys.argv[1]).iter_text())
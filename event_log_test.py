@@ -0,0 +1,74 @@
+import random, sys
+random.seed(42)
+import numpy as np
+from person import Person
+from logger import Logger
+from virus import Virus
+from array_simulation import ArraySimulation
+from event_log import EventLog, EVENT_DTYPE
+import event_log
+import pytest
+
+
+def write_both_formats(log_calls):
+    '''Runs log_calls against a text and a binary Logger, returns both file names.'''
+    text_logger = Logger("logs.txt", "logs_formatting.txt")
+    binary_logger = Logger("logs.bin", "logs_formatting.txt", log_format='binary')
+    for logger in (text_logger, binary_logger):
+        logger.clear_file_text(logger.file_name)
+        log_calls(logger)
+        logger.close()
+    return text_logger.file_name, binary_logger.file_name
+
+def test_header_round_trip():
+    def log_calls(logger):
+        logger.write_metadata(100, 0.9, "Smallpox", 0.15, 0.06, 10)
+    _, binary_name = write_both_formats(log_calls)
+    log = EventLog(binary_name)
+    assert log.metadata['pop_size'] == 100
+    assert log.metadata['virus_name'] == "Smallpox"
+    assert log.metadata['mortality_rate'] == 0.15
+    assert log.header_size % 16 == 0
+    assert len(log) == 0
+
+def test_events_are_fixed_width():
+    virus = Virus("Smallpox", 0.06, 0.15)
+    def log_calls(logger):
+        logger.write_metadata(100, 0.9, virus.name, virus.mortality_rate, virus.repro_rate, 10)
+        logger.log_interaction(Person(1, False, virus), Person(2, True), 'is_vaccinated')
+        logger.log_interaction(Person(1, False, virus), Person(3, False), 'did_infect')
+    _, binary_name = write_both_formats(log_calls)
+    log = EventLog(binary_name)
+    assert EVENT_DTYPE.itemsize == 13
+    assert list(log) == [(1, 1, 2, event_log.OUTCOME_CODES['is_vaccinated']),
+        (1, 1, 3, event_log.OUTCOME_CODES['did_infect'])]
+
+def test_render_text_matches_text_log():
+    virus = Virus("Smallpox", 0.06, 0.15)
+    person = Person(1, False, virus)
+    def log_calls(logger):
+        logger.write_metadata(100, 0.9, virus.name, virus.mortality_rate, virus.repro_rate, 10)
+        for interacted in ('is_vaccinated', 'is_not_sick', 'did_infect', 'did_not_infect'):
+            logger.log_interaction(person, Person(2, False), interacted)
+        logger.log_infection_survival(person)
+        logger.log_time_step(1, 0, 1, 1, 1, 0)
+        logger.log_interactions(np.array([4, 4]), np.array([5, 6]), np.array([0, 2]))
+        logger.log_infection_survivals(np.array([4, 7]), np.array([True, False]))
+        logger.log_time_step(2, 1, 0, 2, 0, 1)
+        #Totals of huge runs do not fit in 32 bits
+        logger.log_time_step(3, 2 ** 33 + 5, 1, 2 ** 32 + 7, 1, 2)
+    text_name, binary_name = write_both_formats(log_calls)
+    with open(text_name, "r") as logs:
+        text = logs.read()
+    assert ''.join(EventLog(binary_name).iter_text()) == text
+
+def test_array_simulation_binary_log():
+    virus = Virus("Smallpox", 0.5, 0.15)
+    logger = Logger("logs.bin", "logs_formatting.txt", buffered=True, log_format='binary')
+    sim = ArraySimulation(1000, 0.5, virus, logger=logger)
+    sim._create_population(sim.initial_infected)
+    sim.time_step()
+    logger.close()
+    events = EventLog(logger.file_name).events
+    assert len(events) == sim.initial_infected * 101
+    assert np.count_nonzero(events['outcome'] == event_log.OUTCOME_CODES['is_vaccinated']) == sim.saved_from_vac
@@ -0,0 +1,154 @@
+import numpy as np
+import event_log
+from array_simulation import ArraySimulation
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+#Codes the kernel writes for each contact, the same as the binary event log
+IS_VACCINATED = event_log.OUTCOME_CODES['is_vaccinated']
+IS_NOT_SICK = event_log.OUTCOME_CODES['is_not_sick']
+DID_INFECT = event_log.OUTCOME_CODES['did_infect']
+DID_NOT_INFECT = event_log.OUTCOME_CODES['did_not_infect']
+
+
+def sequential_step(infected_idx, rolls, alive, vaccinated, infected, living, living_position,
+    living_count, repro_rate, mortality_rate, count, contacts, outcomes, interacted, survived,
+    new_infections):
+    ''' Runs the infected in infected_idx one after the other with the rules of
+    Simulation.time_step: each makes count contacts among the other living people,
+    then survives and becomes vaccinated, or dies and leaves living, before the next
+    one starts. Works in plain Python, or compiled by Numba.
+
+    Every random number comes from rolls, one row per infected person: count rolls
+    that pick the contacts, count infection rolls and one survival roll.
+
+        Args:
+            contacts, outcomes (array): Filled with the slot and outcome code of every
+                contact, one row per infected person.
+            interacted (array): Set to whether each infected person had anybody to meet.
+            survived (array): Set to whether each infected person survived.
+            new_infections (array): Filled from the start with the slots infected.
+
+        Returns:
+            tuple: Number of living people left, vaccinated contacts, deaths and
+            entries written to new_infections.
+    '''
+    saved = 0
+    died = 0
+    infections = 0
+    for row in range(len(infected_idx)):
+        person = infected_idx[row]
+        interacted[row] = living_count > 1
+        if living_count > 1:
+            position = living_position[person]
+            for column in range(count):
+                #Picks among everybody else alive, then skips over the person's own position
+                draw = int(rolls[row, column] * (living_count - 1))
+                if draw >= position:
+                    draw += 1
+                contact = living[draw]
+                contacts[row, column] = contact
+                if vaccinated[contact]:
+                    saved += 1
+                    outcomes[row, column] = IS_VACCINATED
+                elif infected[contact]:
+                    outcomes[row, column] = IS_NOT_SICK
+                elif rolls[row, count + column] <= repro_rate:
+                    new_infections[infections] = contact
+                    infections += 1
+                    outcomes[row, column] = DID_INFECT
+                else:
+                    outcomes[row, column] = DID_NOT_INFECT
+        infected[person] = False
+        vaccinated[person] = True
+        survived[row] = rolls[row, 2 * count] >= mortality_rate
+        if not survived[row]:
+            alive[person] = False
+            died += 1
+            #Moves the last living person into the place of the dead
+            living_count -= 1
+            last = living[living_count]
+            position = living_position[person]
+            living[position] = last
+            living_position[last] = position
+    return living_count, saved, died, infections
+
+
+#The compiled kernel when Numba is installed, or else the plain Python one
+KERNELS = {'python': sequential_step}
+if numba is not None:
+    KERNELS['numba'] = numba.njit(cache=True, nogil=True)(sequential_step)
+DEFAULT_BACKEND = 'numba' if numba is not None else 'python'
+
+
+class KernelSimulation(ArraySimulation):
+    ''' Simulation engine that runs the rules of the person engine, one infected
+    person after the other, over the population arrays of ArraySimulation.
+
+    A person who dies or recovers during a step is dead or vaccinated for everybody
+    after them in the same step, like in Simulation. ArraySimulation gets the same
+    distribution from batched draws, this engine runs the steps of Simulation itself.
+    The loop is a kernel compiled with Numba when it is installed, or the same code
+    run as plain Python otherwise. Its random numbers are drawn with NumPy before
+    it runs, so both backends give the same results for the same seed.
+    '''
+    engine_name = 'kernel'
+    profile_phases = ('_run_kernel', '_infect_newly_infected')
+
+    def __init__(self, pop_size, vacc_percentage, virus, initial_infected=10, backend=None,
+        **kwargs):
+        ''' backend is 'numba' or 'python', by default numba when it is installed.
+        Other keyword arguments are passed on to ArraySimulation.
+        '''
+        super().__init__(pop_size, vacc_percentage, virus, initial_infected, **kwargs)
+        self.backend = backend or DEFAULT_BACKEND # String
+        if self.backend not in KERNELS:
+            raise ValueError(f'Unknown or unavailable kernel backend {self.backend!r}')
+        self.kernel = KERNELS[self.backend]
+
+    def time_step(self):
+        ''' Runs the infected through the kernel, chunk_size people at a time, then
+        infects everybody they infected.
+        '''
+        infected_idx = self.infected_idx
+        new_infections = [self._run_kernel(infected_idx[start:start + self.chunk_size])
+            for start in range(0, len(infected_idx), self.chunk_size)]
+        new_infections = np.sort(np.concatenate(new_infections)) if new_infections \
+            else np.empty(0, dtype=np.int64)
+        #The same person can be infected by several contacts
+        self.infected_idx = np.delete(new_infections,
+            np.flatnonzero(new_infections[1:] == new_infections[:-1]) + 1)
+        self.newly_infected = self.ids[self.infected_idx]
+        self._infect_newly_infected()
+        self.current_infected = len(self.infected_idx)
+        self.total_infected += self.current_infected
+
+    def _run_kernel(self, chunk):
+        ''' Draws the random numbers for a chunk of infected people, runs the kernel
+        over them and logs what happened. Returns the slots they infected.
+        '''
+        count = self.interactions_per_person
+        rolls = self.rng.random((len(chunk), 2 * count + 1))
+        contacts = np.empty((len(chunk), count), dtype=np.int64)
+        outcomes = np.empty((len(chunk), count), dtype=np.uint8)
+        interacted = np.empty(len(chunk), dtype=bool)
+        survived = np.empty(len(chunk), dtype=bool)
+        new_infections = np.empty(len(chunk) * count, dtype=np.int64)
+        living_count, saved, died, infections = self.kernel(chunk, rolls, self.alive,
+            self.vaccinated, self.infected, self.living, self.living_position,
+            len(self.living), self.virus.repro_rate, self.virus.mortality_rate, count,
+            contacts, outcomes, interacted, survived, new_infections)
+        self.living = self.living[:living_count]
+        self.saved_from_vac += saved
+        self.total_dead += died
+        self.total_vaccinated += len(chunk) - died
+
+        if self.logger.logs_interactions:
+            self.logger.log_interactions(np.repeat(self.ids[chunk[interacted]], count),
+                self.ids[contacts[interacted].ravel()], outcomes[interacted].ravel())
+        if self.logger.logs_survival:
+            self.logger.log_infection_survivals(self.ids[chunk], survived)
+        return new_infections[:infections]
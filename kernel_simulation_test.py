@@ -0,0 +1,64 @@
+import random, sys
+random.seed(42)
+import os
+import numpy as np
+from logger import Logger, LOG_NONE
+from virus import Virus
+from kernel_simulation import KernelSimulation, sequential_step, KERNELS
+from ensemble import run_replicate
+import pytest
+
+
+def run(backend, seed=3):
+    virus = Virus("Smallpox", 0.15, 0.3)
+    sim = KernelSimulation(1000, 0.50, virus, backend=backend, seed=seed,
+        logger=Logger(os.devnull, os.devnull, log_level=LOG_NONE))
+    sim.run(plot=False)
+    return sim
+
+def test_backends_give_the_same_run():
+    pytest.importorskip('numba')
+    python, compiled = run('python'), run('numba')
+    assert python.plot_y == compiled.plot_y
+    assert python.plot_y2 == compiled.plot_y2
+    assert python.saved_from_vac == compiled.saved_from_vac
+    assert list(python.living) == list(compiled.living)
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        KernelSimulation(10, 0.5, Virus("Smallpox", 0.15, 0.3), backend='cuda')
+
+def test_recovered_are_vaccinated_for_the_rest_of_the_step():
+    #Slots 0 and 1 are infected and alive, slot 2 is susceptible
+    alive = np.ones(3, dtype=bool)
+    vaccinated = np.zeros(3, dtype=bool)
+    infected = np.array([True, True, False])
+    living = np.arange(3)
+    living_position = np.arange(3)
+    #Slot 0 meets slot 1, then recovers. Slot 1 then meets slot 0, and dies.
+    rolls = np.array([[0.1, 0.9, 0.5], [0.1, 0.0, 0.0]])
+    contacts = np.empty((2, 1), dtype=np.int64)
+    outcomes = np.empty((2, 1), dtype=np.uint8)
+    interacted = np.empty(2, dtype=bool)
+    survived = np.empty(2, dtype=bool)
+    new_infections = np.empty(2, dtype=np.int64)
+    living_count, saved, died, infections = sequential_step(np.array([0, 1]), rolls, alive,
+        vaccinated, infected, living, living_position, 3, 0.5, 0.3, 1, contacts, outcomes,
+        interacted, survived, new_infections)
+    assert list(contacts.ravel()) == [1, 0]
+    assert list(outcomes.ravel()) == [1, 0]
+    assert saved == 1 and died == 1 and infections == 0
+    assert list(survived) == [True, False]
+    assert living_count == 2 and sorted(living[:2]) == [0, 2]
+    assert list(alive) == [True, False, True]
+
+def test_matches_person_engine():
+    config = {'pop_size': 500, 'vacc_percentage': 0.5, 'virus_name': 'Smallpox',
+        'mortality_rate': 0.3, 'repro_rate': 0.15, 'initial_infected': 10}
+    means = {}
+    for engine in ('person', 'kernel'):
+        results = [run_replicate(dict(config, engine=engine), seed) for seed in range(20)]
+        means[engine] = {metric: np.mean([result[metric] for result in results])
+            for metric in ('total_infected', 'total_dead', 'saved_from_vac')}
+    for metric, value in means['person'].items():
+        assert means['kernel'][metric] == pytest.approx(value, rel=0.1)
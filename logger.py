@@ -1,47 +1,250 @@
 import os
 import re
+import queue
+import threading
+import event_log
+import rotating_log
+
+#Log levels, each one also logs everything the levels below it log
+LOG_NONE = 0 # Nothing, not even answers.txt
+LOG_SUMMARY = 1 # Metadata, time step summaries and answers.txt
+LOG_SURVIVAL = 2 # Also whether each infected person survived
+LOG_INTERACTIONS = 3 # Also every interaction
+LOG_LEVELS = {'none': LOG_NONE, 'summary': LOG_SUMMARY, 'survival': LOG_SURVIVAL,
+    'interactions': LOG_INTERACTIONS}
+
+#Interaction log lines, keyed by the result Simulation.interaction returns
+INTERACTION_MESSAGES = {
+    'is_vaccinated': "{0} didn't infect {1} because they were vaccinated.\n",
+    'is_not_sick': "{0} didn't infect {1} because they were already sick.\n",
+    'did_infect': "{0} infected {1}. \n",
+    'did_not_infect': "{0} didn't infect {1} because they got lucky!\n",
+}
 
 
 class Logger(object):
     ''' Utility class responsible for logging all interactions during the simulation. '''
 
-    def __init__(self, file_name, formatting_name):
+    def __init__(self, file_name, formatting_name, buffered=False, queue_size=64,
+        batch_size=1000, log_format='text', log_level=LOG_INTERACTIONS, sample_rate=1,
+        results_store=None, run_params=None, compress=False,
+        segment_bytes=rotating_log.SEGMENT_BYTES):
+        ''' By default every log call opens, appends to and closes file_name.
+
+        A buffered Logger keeps one handle on file_name open instead. Messages are
+        gathered in batches of batch_size and handed to a queue of at most queue_size
+        batches, which a writer thread drains into the file. Call flush() to wait for
+        everything logged so far to reach the file, and close() once done logging.
+
+        The log_format is 'text' for the readable log, or 'binary' for the compact
+        event log described in event_log.py. answers.txt is always text.
+
+        The log_level is one of the LOG_ levels above. With a sample_rate of n only
+        every nth interaction is logged. Simulations check logs_interactions and
+        logs_survival before building anything to log, so lower levels cost nothing.
+
+        A compress Logger writes file_name as gzip segments of about segment_bytes
+        each, with an index of the time steps in each, see rotating_log.py. Starting
+        a run starts new segments instead of emptying the old ones. Only text logs
+        can be compressed, event_log.py reads binary logs from a single file.
+
+        With a results_store (see results_store.py), every run from write_metadata to
+        log_answers is also added to it at any log level, with its inputs and the
+        run_params dict as its params. Runs resumed from a checkpoint are not added.
+        '''
+        if log_format not in ('text', 'binary'):
+            raise ValueError(f"log_format must be 'text' or 'binary', not {log_format!r}")
+        if compress and log_format != 'text':
+            raise ValueError(f"only text logs can be compressed, not {log_format!r} logs")
+        if sample_rate < 1:
+            raise ValueError(f'sample_rate must be at least 1, not {sample_rate}')
         self.file_name = file_name
         self.formatting_name = formatting_name
+        self.buffered = buffered # Bool
+        self.queue_size = queue_size # Int
+        self.batch_size = batch_size # Int
+        self.log_format = log_format # 'text' or 'binary'
+        self.log_level = log_level # Int, one of the LOG_ levels
+        self.sample_rate = sample_rate # Int, log one in every sample_rate interactions
+        self._sample_count = 0 # Interactions seen since the last one logged, mod sample_rate
+        self.step = 1 # Time step that interactions are currently logged under
+        self._pending = [] # Messages not yet handed to the writer thread
+        self._queue = None
+        self._writer = None
+        self._handle = None
+        self._error = None
+        self.compress = compress # Bool
+        self.segment_bytes = segment_bytes # Int
+        self._pending_step = 1 # Time step of the messages in _pending
+        self.results_store = results_store # ResultsStore or None
+        self.run_params = run_params or {} # Extra params of the runs added to results_store
+        self._run = None # RunWriter of the run being logged to results_store
+
+    @property
+    def logs_summary(self):
+        return self.log_level >= LOG_SUMMARY
+
+    @property
+    def logs_survival(self):
+        return self.log_level >= LOG_SURVIVAL
+
+    @property
+    def logs_interactions(self):
+        return self.log_level >= LOG_INTERACTIONS
+
+    def _sampled(self, count):
+        '''Counts count more interactions and returns the positions among them that
+        should be logged under the sample_rate.
+        '''
+        first = -self._sample_count % self.sample_rate
+        self._sample_count = (self._sample_count + count) % self.sample_rate
+        return range(first, count, self.sample_rate)
 
     def clear_file_text(self, file_name):
+        if self.buffered and file_name == self.file_name:
+            self.flush()
+        if self.compress and file_name == self.file_name:
+            self._open_handle().new_run()
+            return
         open(file_name, 'w').close()
 
+    @staticmethod
+    def format_text(message):
+        '''Returns message with blank lines dropped and every line stripped and
+        single spaced, followed by an empty line.
+        '''
+        list_lines = []
+        for line in message.split('\n'):
+            if len(line.strip()) > 0:
+                list_lines.append(re.sub(' +', ' ', line).strip())
+        for _ in range(2): list_lines.append('')
+        return '\n'.join(list_lines)
+
     def text_formatting(self, file_name, message):
         '''The logger uses this method to make doc strings flush with text document'''
-        #Removes White space from lines
-        with open(self.formatting_name, "w") as logs_f:
-            logs_f.writelines(message)
-        with open(self.formatting_name, "r") as logs_f:
-            list_lines = []
-            lines = logs_f.readlines()
-            for line in lines:
-                if len(line.strip()) > 0:
-                    list_lines.append(re.sub(' +', ' ', line).strip())
-        #Writing with a new line 
-        with open(file_name, "a") as logs:
-            for _ in range(2): list_lines.append('')
-            logs.writelines('\n'.join(list_lines))
+        self._write(file_name, self.format_text(message))
 
-    def write_metadata(self, pop_size, vacc_percentage, virus_name, mortality_rate,
-        repro_num, initial_infected):
-        '''The simulation class should use this method immediately to log the specific
-        parameters of the simulation as the first line of the file.
+    def _write(self, file_name, data):
+        '''Appends data to file_name, through the writer thread when buffered.'''
+        if self.compress and not self.buffered and file_name == self.file_name:
+            self._open_handle().write(data, self.step)
+            return
+        if not (self.buffered and file_name == self.file_name):
+            with open(file_name, "ab" if isinstance(data, bytes) else "a") as logs:
+                logs.write(data)
+            return
+        #Compressed batches hold a single step, for the segment index
+        if self.compress and self._pending and self._pending_step != self.step:
+            self._hand_off()
+        self._pending_step = self.step
+        self._pending.append(data)
+        if len(self._pending) >= self.batch_size:
+            self._hand_off()
+
+    def _hand_off(self):
+        '''Queues the pending messages as one batch, starting the writer if needed.'''
+        if self._writer is None:
+            self._open_handle()
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._writer = threading.Thread(target=self._drain, daemon=True)
+            self._writer.start()
+        self._check_writer()
+        empty = b'' if self.log_format == 'binary' else ''
+        self._queue.put((self._pending_step, empty.join(self._pending)))
+        self._pending = []
+
+    def _open_handle(self):
+        '''Opens the handle on file_name if it is not open, and returns it. Compressed
+        logs get a RotatingLog, which also takes the step of every write.
         '''
+        if self._handle is None:
+            if self.compress:
+                self._handle = rotating_log.RotatingLog(self.file_name, self.segment_bytes)
+            else:
+                self._handle = open(self.file_name, "ab" if self.log_format == 'binary' else "a")
+        return self._handle
+
+    def _drain(self):
+        '''Writer thread loop. Writes queued (step, batch) pairs until it receives None.'''
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                step, batch = item
+                if self._error is None and self.compress:
+                    self._handle.write(batch, step)
+                elif self._error is None:
+                    self._handle.write(batch)
+            except Exception as error:
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def _check_writer(self):
+        '''Raises any error the writer thread hit, in the logging thread.'''
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def flush(self):
+        '''Blocks until every message logged so far has been written to file_name.'''
+        if self._pending:
+            self._hand_off()
+        if self._writer is not None:
+            self._queue.join()
+            self._check_writer()
+        if self._handle is not None:
+            self._handle.flush()
+
+    def close(self):
+        '''Flushes, then stops the writer thread and closes the log file handle.
+        Logging after close() starts a new writer.
+        '''
+        try:
+            self.flush()
+        finally:
+            if self._writer is not None:
+                self._queue.put(None)
+                self._writer.join()
+                self._writer = None
+                self._queue = None
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    @classmethod
+    def metadata_text(cls, pop_size, vacc_percentage, virus_name, mortality_rate,
+        repro_num, initial_infected):
+        '''Returns the text log header written by write_metadata.'''
         metadata = (f"""
             Population Size: {pop_size}\nVaccine Percentage: {vacc_percentage}\n
             Virus Name = {virus_name}\nMortality Rate = {mortality_rate}\n
             Reproduction Rate = {repro_num}\nPeople Initially Infected: {initial_infected}\n
             """)
         #Removes indentation from the string, and reformats it to allign with text file.
-        self.text_formatting(self.file_name, metadata)
-        with open(self.file_name, "a") as logs_f:
-            logs_f.write("Beginning step 1\n\n")
+        return cls.format_text(metadata) + "Beginning step 1\n\n"
+
+    def write_metadata(self, pop_size, vacc_percentage, virus_name, mortality_rate,
+        repro_num, initial_infected):
+        '''The simulation class should use this method immediately to log the specific
+        parameters of the simulation as the first line of the file.
+        '''
+        self.step = 1
+        if self.results_store is not None:
+            params = {'pop_size': pop_size, 'vacc_percentage': vacc_percentage,
+                'virus_name': virus_name, 'mortality_rate': mortality_rate,
+                'repro_rate': repro_num, 'initial_infected': initial_infected}
+            params.update(self.run_params)
+            self._run = self.results_store.start_run(params)
+        if not self.logs_summary:
+            return
+        if self.log_format == 'binary':
+            self._write(self.file_name, event_log.encode_header(pop_size, vacc_percentage,
+                virus_name, mortality_rate, repro_num, initial_infected))
+            return
+        self._write(self.file_name, self.metadata_text(pop_size, vacc_percentage,
+            virus_name, mortality_rate, repro_num, initial_infected))
 
     def log_interaction(self, person, random_person, interacted):
         '''
@@ -53,22 +256,40 @@ class Logger(object):
         or the other edge cases:
             "{person.ID} didn't infect {random_person.ID} because {'vaccinated' or 'already sick'} \n"
         '''
-        #Different Case responses
-        is_vaccinated = f"{person._id} didn't infect {random_person._id} because they were vaccinated.\n"
-        is_already_sick = f"{person._id} didn't infect {random_person._id} because they were already sick.\n"
-        is_infected = f"{person._id} infected {random_person._id}. \n"
-        is_not_infected = f"{person._id} didn't infect {random_person._id} because they got lucky!\n"
-
         #Booleans Declared by interaction in Simulation
-        with open(self.file_name, "a") as logs:
-            if interacted == 'is_vaccinated':
-                logs.write(is_vaccinated)
-            elif interacted == 'is_not_sick':
-                logs.write(is_already_sick)
-            elif interacted == 'did_infect':
-                logs.write(is_infected)
-            elif interacted == 'did_not_infect':
-                logs.write(is_not_infected)
+        if interacted not in INTERACTION_MESSAGES or not self.logs_interactions:
+            return
+        if self.sample_rate > 1 and not self._sampled(1):
+            return
+        if self.log_format == 'binary':
+            self._write(self.file_name, event_log.encode_event(self.step, person._id,
+                random_person._id, event_log.OUTCOME_CODES[interacted]))
+        else:
+            self._write(self.file_name,
+                INTERACTION_MESSAGES[interacted].format(person._id, random_person._id))
+
+    def log_interactions(self, person_ids, random_person_ids, outcome_codes):
+        '''Logs a batch of interactions given as arrays of ids and event_log outcome codes.
+        Used by the array engines, which have no Person objects to pass in.
+        '''
+        if not self.logs_interactions:
+            return
+        if self.sample_rate > 1:
+            sampled = self._sampled(len(person_ids))
+            sampled = slice(sampled.start, sampled.stop, sampled.step)
+            person_ids = person_ids[sampled]
+            random_person_ids = random_person_ids[sampled]
+            outcome_codes = outcome_codes[sampled]
+        if len(person_ids) == 0:
+            return
+        if self.log_format == 'binary':
+            self._write(self.file_name, event_log.encode_events(self.step, person_ids,
+                random_person_ids, outcome_codes))
+            return
+        messages = [INTERACTION_MESSAGES[event_log.OUTCOMES[code]] for code in range(4)]
+        self._write(self.file_name, ''.join([messages[code].format(person_id, random_person_id)
+            for person_id, random_person_id, code
+            in zip(person_ids.tolist(), random_person_ids.tolist(), outcome_codes.tolist())]))
 
     def log_infection_survival(self, person):
         ''' The Simulation object uses this method to log the results of every
@@ -77,15 +298,50 @@ class Logger(object):
         The format of the log should be:
             "{person.ID} died from infection\n" or "{person.ID} survived infection.\n"
         '''
-        is_dead = f"{person._id} died from the infection.\n"
-        is_not_dead = f"{person._id} survived the infection!\n"
-
         #Booleans Declared by interaction person's did_survive_infection function
-        with open(self.file_name, "a") as logs:
-                if person.is_alive:
-                    logs.write(is_not_dead)
-                else:
-                    logs.write(is_dead)
+        if not self.logs_survival:
+            return
+        if self.log_format == 'binary':
+            outcome = event_log.SURVIVED if person.is_alive else event_log.DIED
+            self._write(self.file_name, event_log.encode_event(self.step, person._id,
+                person._id, outcome))
+        else:
+            self._write(self.file_name, self.survival_text(person._id, person.is_alive))
+
+    def log_infection_survivals(self, person_ids, is_alive):
+        '''Logs a batch of survival results given as arrays of ids and alive flags.'''
+        if len(person_ids) == 0 or not self.logs_survival:
+            return
+        if self.log_format == 'binary':
+            outcomes = event_log.DIED - is_alive.astype('u1')
+            self._write(self.file_name, event_log.encode_events(self.step, person_ids,
+                person_ids, outcomes))
+            return
+        self._write(self.file_name, ''.join([self.survival_text(person_id, alive)
+            for person_id, alive in zip(person_ids.tolist(), is_alive.tolist())]))
+
+    @staticmethod
+    def survival_text(person_id, is_alive):
+        '''Returns the survival log line for a person.'''
+        if is_alive:
+            return f"{person_id} survived the infection!\n"
+        return f"{person_id} died from the infection.\n"
+
+    @classmethod
+    def time_step_text(cls, time_step_number, total_dead, current_infected,
+        total_infected, newly_infected, dead_this_step):
+        '''Returns the text summary written by log_time_step.'''
+        time_step_summary = (f"""\
+            {'-'*50}\nTime step {time_step_number} ended\nInfected this time step: {current_infected}\n
+            Died this time step: {dead_this_step}\nTotal Population that has been infected = {total_infected}\n
+            Total Deaths = {total_dead}\n{'-'*50}\n
+            """)
+        #Removes indentation from the string, and reformats it to allign with text file.
+        text = cls.format_text(time_step_summary)
+        #If it's the last step, the next step is not announced
+        if current_infected != 0:
+            text += f"Beginning step {time_step_number + 1}\n\n"
+        return text
 
     def log_time_step(self, time_step_number, total_dead, current_infected,
         total_infected, newly_infected, dead_this_step):
@@ -103,21 +359,27 @@ class Logger(object):
         The format of this log should be:
             "Time step {time_step_number} ended, beginning {time_step_number + 1}\n"
         '''
-        time_step_summary = (f"""\
-            {'-'*50}\nTime step {time_step_number} ended\nInfected this time step: {current_infected}\n
-            Died this time step: {dead_this_step}\nTotal Population that has been infected = {total_infected}\n
-            Total Deaths = {total_dead}\n{'-'*50}\n
-            """)
-        #Removes indentation from the string, and reformats it to allign with text file.
-        self.text_formatting(self.file_name, time_step_summary)
-        #If it's the last step, function will not write to file
-        if current_infected != 0:
-            with open(self.file_name, "a") as logs_f:
-                logs_f.write(f"Beginning step {time_step_number + 1}\n\n")
+        if self._run is not None:
+            self._run.append_step(time_step_number, total_dead, current_infected,
+                total_infected, newly_infected, dead_this_step)
+        #The summary is logged under the step it ends, then the next step begins
+        if self.logs_summary and self.log_format == 'binary':
+            self._write(self.file_name, event_log.encode_time_step(time_step_number,
+                total_dead, current_infected, total_infected, newly_infected, dead_this_step))
+        elif self.logs_summary:
+            self._write(self.file_name, self.time_step_text(time_step_number, total_dead,
+                current_infected, total_infected, newly_infected, dead_this_step))
+        self.step = time_step_number + 1
 
     def log_answers(self, total_dead, total_infected, virus, pop_size, vacc_percentage,
         initial_infected, saved_from_vac):
         ''' The Simulation object uses this method to log the answers of the ReadMe '''
+        if self._run is not None:
+            self._run.finish({'total_dead': total_dead, 'total_infected': total_infected,
+                'saved_from_vac': saved_from_vac})
+            self._run = None
+        if not self.logs_summary:
+            return
 
         infected_percentage  = f"{float(total_infected / pop_size)}%"
         dead_percentage = f"{float(total_dead / pop_size)}%"
@@ -2,7 +2,7 @@ import random, sys
 random.seed(42)
 import numpy as np
 from person import Person
-from logger import Logger
+from logger import Logger, LOG_NONE, LOG_SUMMARY
 from virus import Virus
 from simulation import Simulation
 import pytest
@@ -106,3 +106,72 @@ def test_log_answers():
         lines = logs.readlines()
     assert lines[0] == f'1. Inputs I gave for the simulation were: 400 0.6 Billbonic_Plague 0.85 0.8 10\n'
     assert lines[3] == f'4. The amount of times someone was saved because they were vaccinated was {sim.saved_from_vac}\n'
+
+def test_buffered_logger_matches_unbuffered():
+    virus = Virus("Smallpox", 0.06, 0.15)
+    person = Person(1, False, infection=virus)
+    random_person = Person(2, True, None)
+    contents = []
+    for buffered in (False, True):
+        logger = Logger("logs.txt", "logs_formatting.txt", buffered=buffered, batch_size=2)
+        logger.clear_file_text(logger.file_name)
+        logger.write_metadata(100, 0.9, virus.name, virus.mortality_rate, virus.repro_rate, 10)
+        for _ in range(5):
+            logger.log_interaction(person, random_person, 'is_vaccinated')
+        logger.log_infection_survival(person)
+        logger.log_time_step(1, 0, 1, 1, 1, 0)
+        logger.close()
+        with open(logger.file_name, "r") as logs:
+            contents.append(logs.read())
+    assert contents[0] == contents[1]
+
+def test_buffered_logger_flush():
+    virus = Virus("Smallpox", 0.06, 0.15)
+    logger = Logger("logs.txt", "logs_formatting.txt", buffered=True)
+    logger.clear_file_text(logger.file_name)
+    logger.log_interaction(Person(1, False, infection=virus), Person(2, True, None),
+        'is_vaccinated')
+    with open(logger.file_name, "r") as logs:
+        assert logs.readlines() == []
+    logger.flush()
+    with open(logger.file_name, "r") as logs:
+        assert logs.readlines() == ["1 didn't infect 2 because they were vaccinated.\n"]
+    logger.close()
+
+def test_log_level_summary_skips_interactions():
+    virus = Virus("Smallpox", 0.06, 0.15)
+    logger = Logger("logs.txt", "logs_formatting.txt", log_level=LOG_SUMMARY)
+    logger.clear_file_text(logger.file_name)
+    person = Person(1, False, infection=virus)
+    logger.log_interaction(person, Person(2, True, None), 'is_vaccinated')
+    logger.log_infection_survival(person)
+    logger.log_time_step(1, 0, 0, 1, 0, 0)
+    with open(logger.file_name, "r") as logs:
+        lines = logs.readlines()
+    assert lines[0] == f"{'-'*50}\n"
+    assert lines[1] == "Time step 1 ended\n"
+
+def test_log_level_none_writes_nothing():
+    virus = Virus("Smallpox", 0.06, 0.15)
+    logger = Logger("logs.txt", "logs_formatting.txt")
+    logger.clear_file_text(logger.file_name)
+    sim = Simulation(100, 0.90, virus, logger=Logger("logs.txt", "logs_formatting.txt",
+        log_level=LOG_NONE))
+    sim._create_population(sim.initial_infected)
+    sim.time_step()
+    with open(logger.file_name, "r") as logs:
+        assert logs.readlines() == []
+
+def test_sampled_interactions():
+    virus = Virus("Smallpox", 0.06, 0.15)
+    logger = Logger("logs.txt", "logs_formatting.txt", sample_rate=3)
+    logger.clear_file_text(logger.file_name)
+    person = Person(1, False, infection=virus)
+    for i in range(2, 6):
+        logger.log_interaction(person, Person(i, True, None), 'is_vaccinated')
+    logger.log_interactions(np.array([1] * 4), np.arange(6, 10), np.zeros(4, dtype=np.uint8))
+    with open(logger.file_name, "r") as logs:
+        lines = logs.readlines()
+    assert [line.split()[3] for line in lines] == ['2', '5', '8']
+    with pytest.raises(ValueError):
+        Logger("logs.txt", "logs_formatting.txt", sample_rate=0)
@@ -0,0 +1,128 @@
+''' Contact networks for NetworkSimulation, stored as compressed sparse rows.
+
+The neighbours of the person in slot i (person id i + 1) are
+indices[indptr[i]:indptr[i + 1]], sorted. Networks are undirected, without
+self-loops or repeated edges, and take 4 bytes per edge end plus 8 bytes per person,
+with no Python object per person.
+
+A network is described by a spec string, see build_network:
+    random:20               random graph with 20 contacts per person on average
+    households:4:2          households of 4 people, plus 2 random outside contacts each
+    small-world:10:0.1      ring of 10 neighbours each, 10% of edges rewired at random
+    edges:contacts.txt      edge list file of "id id" lines, ids starting at 1
+'''
+
+import numpy as np
+
+DEFAULT_NETWORK = 'random:20'
+
+
+class ContactNetwork(object):
+    ''' Undirected contact network in compressed sparse row form. '''
+
+    def __init__(self, indptr, indices):
+        self.indptr = indptr # Array of pop_size + 1 offsets into indices
+        self.indices = indices # Array of neighbour slots, int32
+        self.pop_size = len(indptr) - 1 # Int
+
+    @property
+    def edges(self):
+        '''Number of undirected edges.'''
+        return len(self.indices) // 2
+
+    def degrees(self):
+        '''Returns the number of neighbours of every slot.'''
+        return np.diff(self.indptr)
+
+    def neighbours(self, slot):
+        '''Returns the slots of the neighbours of slot.'''
+        return self.indices[self.indptr[slot]:self.indptr[slot + 1]]
+
+
+def from_edges(pop_size, sources, targets):
+    '''Builds a ContactNetwork of pop_size people from arrays of edge end slots.
+    Edges are made undirected, and self-loops and repeated edges are dropped.
+    '''
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    keep = sources != targets
+    sources, targets = sources[keep], targets[keep]
+    #Sorting row * pop_size + column orders the edges by row, then column
+    keys = np.concatenate([sources * pop_size + targets, targets * pop_size + sources])
+    keys.sort()
+    #Drops repeats by hand, np.unique is much slower on large arrays
+    keys = np.delete(keys, np.flatnonzero(keys[1:] == keys[:-1]) + 1)
+    rows = keys // pop_size
+    indptr = np.zeros(pop_size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=pop_size), out=indptr[1:])
+    return ContactNetwork(indptr, (keys % pop_size).astype(np.int32))
+
+
+def random_network(pop_size, mean_degree, rng):
+    '''Random graph where every pair of people is equally likely to be in contact.'''
+    count = int(pop_size * mean_degree / 2)
+    return from_edges(pop_size, rng.integers(0, pop_size, count), rng.integers(0, pop_size, count))
+
+
+def households(pop_size, household_size, outside_contacts, rng):
+    '''Everybody is in contact with their whole household of household_size
+    consecutive slots, plus outside_contacts random people on average. rng is not
+    used without outside contacts.
+    '''
+    slots = np.arange(pop_size, dtype=np.int64)
+    sources, targets = [slots[:0]], [slots[:0]]
+    for offset in range(1, household_size):
+        same_household = slots[(slots % household_size) + offset < household_size]
+        same_household = same_household[same_household + offset < pop_size]
+        sources.append(same_household)
+        targets.append(same_household + offset)
+    count = int(pop_size * outside_contacts / 2)
+    if count:
+        sources.append(rng.integers(0, pop_size, count))
+        targets.append(rng.integers(0, pop_size, count))
+    return from_edges(pop_size, np.concatenate(sources), np.concatenate(targets))
+
+
+def small_world(pop_size, degree, rewire, rng):
+    '''Watts-Strogatz graph: a ring where everybody is in contact with the degree
+    nearest people, degree // 2 on each side, with each edge moved to a random
+    person with probability rewire.
+    '''
+    slots = np.arange(pop_size, dtype=np.int64)
+    sources = np.tile(slots, degree // 2)
+    targets = (sources + np.repeat(np.arange(1, degree // 2 + 1), pop_size)) % pop_size
+    rewired = rng.random(len(targets)) < rewire
+    targets[rewired] = rng.integers(0, pop_size, int(np.count_nonzero(rewired)))
+    return from_edges(pop_size, sources, targets)
+
+
+def load_edge_list(file_name, pop_size):
+    '''Loads a network from a text file with one "id id" edge per line, where ids
+    are person ids from 1 to pop_size. Lines starting with # are skipped.
+    '''
+    edges = np.loadtxt(file_name, dtype=np.int64, comments='#', usecols=(0, 1), ndmin=2)
+    if len(edges) and (edges.min() < 1 or edges.max() > pop_size):
+        raise ValueError(f'{file_name} has ids outside 1 to {pop_size}')
+    return from_edges(pop_size, edges[:, 0] - 1, edges[:, 1] - 1)
+
+
+def build_network(spec, pop_size, rng):
+    '''Returns the ContactNetwork described by a spec string, see the module
+    docstring. Values left out of the spec take their defaults. Random networks are
+    drawn from the Generator rng.
+    '''
+    kind, _, arguments = spec.partition(':')
+    if kind == 'edges':
+        return load_edge_list(arguments, pop_size)
+    defaults = {'random': ['20'], 'households': ['4', '2'], 'small-world': ['10', '0.1']}
+    if kind not in defaults:
+        raise ValueError(f'Unknown network {kind!r}, use random, households, small-world or edges')
+    values = arguments.split(':') if arguments else []
+    if len(values) > len(defaults[kind]):
+        raise ValueError(f'Too many values in network spec {spec!r}')
+    values += defaults[kind][len(values):]
+    if kind == 'random':
+        return random_network(pop_size, float(values[0]), rng)
+    if kind == 'households':
+        return households(pop_size, int(values[0]), float(values[1]), rng)
+    return small_world(pop_size, int(values[0]), float(values[1]), rng)
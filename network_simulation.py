@@ -0,0 +1,73 @@
+import numpy as np
+import network as contact_network
+from array_simulation import ArraySimulation
+
+
+class NetworkSimulation(ArraySimulation):
+    ''' Simulation engine where people only meet their neighbours in a contact network.
+
+    Works like ArraySimulation, except that each infected person draws their 100
+    contacts with replacement from their neighbours alive by their turn instead of
+    from everybody alive. Someone whose neighbours have all died makes no contacts. The network is
+    held as compressed sparse rows (see network.py), so memory grows with the number
+    of edges and there is no Python object per person.
+    '''
+    engine_name = 'network'
+    config_options = {'network': str}
+
+    def __init__(self, pop_size, vacc_percentage, virus, initial_infected=10,
+        network=contact_network.DEFAULT_NETWORK, **kwargs):
+        ''' network is a ContactNetwork or a spec string for network.build_network.
+        Random networks are drawn from their own stream of the simulation's seed, so
+        the same seed always gives the same network. Other keyword arguments are
+        passed on to ArraySimulation.
+        '''
+        super().__init__(pop_size, vacc_percentage, virus, initial_infected, **kwargs)
+        if isinstance(network, str):
+            self.network_spec = network # String, or None for a network passed in
+            network_rng, = self.spawn_rngs(1)
+            network = contact_network.build_network(network, pop_size, network_rng)
+        else:
+            self.network_spec = None
+        if network.pop_size != pop_size:
+            raise ValueError(f'The network has {network.pop_size} people, not {pop_size}')
+        self.network = network # ContactNetwork
+
+    def config(self):
+        ''' Returns the inputs of the simulation, with the spec of its network.
+        A network passed in as a ContactNetwork has no spec to rebuild it from, so its
+        simulation has no config and cannot be checkpointed.
+        '''
+        if self.network_spec is None:
+            raise ValueError('A simulation over a ContactNetwork object has no config, '
+                'pass the network as a spec string to checkpoint it')
+        config = super().config()
+        config['network'] = self.network_spec
+        return config
+
+    def _draw_contacts(self, living, positions, reach=None):
+        ''' Draws interactions_per_person contacts for each infected person of a chunk
+        from their neighbours in the first reach of living, by default all of it.
+        Returns the slots of the person making each contact and of the person contacted.
+        '''
+        infected = living[positions]
+        indptr = self.network.indptr
+        starts = indptr[infected]
+        degrees = indptr[infected + 1] - starts
+        #Every neighbour slot of the chunk in one array, with the chunk index it belongs to
+        owners = np.repeat(np.arange(len(infected)), degrees)
+        offsets = np.arange(len(owners)) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+        neighbours = self.network.indices[np.repeat(starts, degrees) + offsets]
+        #Compacts them to the living neighbours, still grouped by owner
+        living_neighbours = self.alive[neighbours]
+        if reach is not None:
+            living_neighbours &= self.living_position[neighbours] < reach[owners]
+        neighbours = neighbours[living_neighbours].astype(np.int64)
+        counts = np.bincount(owners[living_neighbours], minlength=len(infected))
+        first = np.cumsum(counts) - counts
+        has_contacts = np.flatnonzero(counts)
+        draws = self.rng.integers(0, counts[has_contacts][:, None],
+            size=(len(has_contacts), self.interactions_per_person))
+        draws += first[has_contacts][:, None]
+        return (np.repeat(infected[has_contacts], self.interactions_per_person),
+            neighbours[draws.ravel()])
@@ -0,0 +1,57 @@
+import random, sys
+random.seed(42)
+import os
+import numpy as np
+from logger import Logger, LOG_NONE
+from virus import Virus
+from network import households, random_network
+from network_simulation import NetworkSimulation
+from simulation import create_simulation
+import pytest
+
+
+def test_contacts_are_living_neighbours():
+    virus = Virus("Smallpox", 0.2, 0.15)
+    sim = NetworkSimulation(1000, 0.5, virus, network='small-world:6:0.2')
+    sim._create_population(sim.initial_infected)
+    sim.alive[sim.network.neighbours(sim.infected_idx[0])[0]] = False
+    sources, contacts = sim._draw_contacts(sim.living, sim.living_position[sim.infected_idx])
+    assert len(contacts) == 100 * sim.initial_infected
+    for source, contact in zip(sources.tolist(), contacts.tolist()):
+        assert contact in sim.network.neighbours(source)
+    assert sim.alive[contacts].all()
+
+def test_isolated_people_make_no_contacts():
+    virus = Virus("Smallpox", 1.0, 0.0)
+    #Households of one, so nobody has any contacts
+    sim = NetworkSimulation(100, 0.0, virus, network=households(100, 1, 0, None))
+    sim._create_population(sim.initial_infected)
+    sim.time_step()
+    assert sim.current_infected == 0
+    assert sim.total_vaccinated == sim.initial_infected
+
+def test_spreads_only_along_edges():
+    virus = Virus("Smallpox", 1.0, 0.0)
+    sim = NetworkSimulation(100, 0.0, virus, initial_infected=1, network=households(100, 5, 0, None),
+        logger=Logger(os.devnull, os.devnull, log_level=LOG_NONE))
+    sim.run(plot=False)
+    #The whole household of the first infected person and nobody else
+    assert sim.total_infected == 4
+    assert sim.total_vaccinated == 5
+
+def test_same_seed_same_network():
+    config = {'pop_size': 500, 'vacc_percentage': 0.5, 'virus_name': 'Smallpox',
+        'mortality_rate': 0.15, 'repro_rate': 0.2, 'engine': 'network', 'network': 'random:8'}
+    first = create_simulation(config, seed=4)
+    second = create_simulation(config, seed=4)
+    assert np.array_equal(first.network.indices, second.network.indices)
+    assert first.config()['network'] == 'random:8'
+    with pytest.raises(ValueError):
+        create_simulation(dict(config, pop_size=400), network=first.network)
+
+def test_network_object_has_no_config():
+    virus = Virus("Smallpox", 0.2, 0.15)
+    network = random_network(100, 4, np.random.default_rng(0))
+    sim = NetworkSimulation(100, 0.5, virus, network=network)
+    with pytest.raises(ValueError):
+        sim.config()
@@ -0,0 +1,45 @@
+import random, sys
+random.seed(42)
+import numpy as np
+from network import from_edges, random_network, households, small_world, load_edge_list, build_network
+import pytest
+
+
+def test_from_edges():
+    network = from_edges(4, [0, 1, 0, 2, 3], [1, 0, 2, 2, 1])
+    #The repeated edge and the self-loop are dropped
+    assert network.edges == 3
+    assert list(network.neighbours(0)) == [1, 2]
+    assert list(network.neighbours(1)) == [0, 3]
+    assert list(network.degrees()) == [2, 2, 1, 1]
+    assert network.indices.dtype == np.int32
+
+def test_generators():
+    rng = np.random.default_rng(0)
+    network = random_network(1000, 10, rng)
+    assert network.pop_size == 1000
+    assert 4500 < network.edges <= 5000
+    network = households(1000, 4, 0, rng)
+    assert list(network.neighbours(5)) == [4, 6, 7]
+    assert network.edges == 250 * 6
+    network = small_world(1000, 10, 0.0, rng)
+    assert set(network.degrees()) == {10}
+    assert list(network.neighbours(0)) == [1, 2, 3, 4, 5, 995, 996, 997, 998, 999]
+
+def test_load_edge_list(tmp_path):
+    edges = tmp_path / "edges.txt"
+    edges.write_text("# id id\n1 2\n2 3\n")
+    network = load_edge_list(str(edges), 3)
+    assert list(network.neighbours(1)) == [0, 2]
+    assert build_network(f'edges:{edges}', 3, None).edges == 2
+    with pytest.raises(ValueError):
+        load_edge_list(str(edges), 2)
+
+def test_build_network():
+    rng = np.random.default_rng(0)
+    assert build_network('households:2:0', 10, rng).edges == 5
+    assert set(build_network('small-world:4', 100, rng).degrees()) != {4}
+    with pytest.raises(ValueError):
+        build_network('lattice:3', 10, rng)
+    with pytest.raises(ValueError):
+        build_network('random:3:4', 10, rng)
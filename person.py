@@ -1,5 +1,4 @@
 import random
-random.seed(42)
 from virus import Virus
 
 
@@ -19,13 +18,14 @@ class Person(object):
         self.is_vaccinated = is_vaccinated  # boolean
         self.infection = infection  # Virus object or None
 
-    def did_survive_infection(self):
+    def did_survive_infection(self, rng=random):
         ''' Generate a random number and compare to virus's mortality_rate.
         If random number is smaller, person dies from the disease.
         If Person survives, they become vaccinated and they have no infection.
         Return a boolean value indicating whether they survived the infection.
+        The random number comes from rng, the simulation passes in its own generator.
         '''
-        death = random.random()
+        death = rng.random()
         if death >= self.infection.mortality_rate: #Survived the Infection
             self.is_vaccinated = True
             self.infection = None
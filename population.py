@@ -0,0 +1,146 @@
+''' Builds the initial population of a simulation as boolean arrays, one chunk at a time.
+
+A random set of people is drawn in two stages: the number that falls in each chunk of
+CHUNK_SIZE people is drawn from a hypergeometric distribution, then the people within
+the chunk. Every set of the same size is equally likely, like with rng.choice over the
+whole population, but the temporary arrays only ever hold one chunk, so building a
+hundred million people takes little more memory than the arrays it fills.
+
+PopulationStore keeps a whole population in one byte per person, for engines that
+need Person-like objects without paying for one per person.
+'''
+
+import random
+import numpy as np
+
+#People seeded at once, which bounds the temporary memory used
+CHUNK_SIZE = 1 << 20
+#Bits of a person's state code in PopulationStore
+ALIVE = 1
+VACCINATED = 2
+INFECTED = 4
+#numpy's hypergeometric needs both ngood and nbad below this
+HYPERGEOMETRIC_LIMIT = 10 ** 9
+
+
+def seed_mask(rng, mask, count, chunk_size=CHUNK_SIZE):
+    ''' Sets count random entries of the boolean array mask to True, all others to False.
+    A chunk and the people after it are the two sides of a hypergeometric draw, so
+    both must stay below HYPERGEOMETRIC_LIMIT: populations of more than chunk_size
+    people can have at most chunk_size + HYPERGEOMETRIC_LIMIT - 1 of them.
+    '''
+    size = len(mask)
+    if not 0 <= count <= size:
+        raise ValueError(f'Cannot seed {count} people in a population of {size}')
+    if size > chunk_size and max(chunk_size, size - chunk_size) >= HYPERGEOMETRIC_LIMIT:
+        raise ValueError(f'Cannot seed a population of {size} in chunks of {chunk_size}, '
+            f"numpy's hypergeometric needs both sides below {HYPERGEOMETRIC_LIMIT}")
+    remaining = count
+    for start in range(0, size, chunk_size):
+        chunk = mask[start:start + chunk_size]
+        chunk[:] = False
+        rest = size - start - len(chunk)
+        #How many of the remaining people fall in this chunk rather than after it
+        in_chunk = int(rng.hypergeometric(len(chunk), rest, remaining)) if rest else remaining
+        if in_chunk:
+            chunk[rng.choice(len(chunk), in_chunk, replace=False)] = True
+        remaining -= in_chunk
+    return mask
+
+
+def seed_population(rng, pop_size, amount_vaccinated, initial_infected, chunk_size=CHUNK_SIZE):
+    ''' Returns the vaccinated and infected masks of a new population: a random set of
+    amount_vaccinated people and an independent random set of initial_infected people,
+    so some of the infected can be vaccinated.
+    '''
+    vaccinated = seed_mask(rng, np.empty(pop_size, dtype=bool), amount_vaccinated, chunk_size)
+    infected = seed_mask(rng, np.empty(pop_size, dtype=bool), initial_infected, chunk_size)
+    return vaccinated, infected
+
+
+class PopulationStore(object):
+    ''' Population kept as one state code byte per person, made of the ALIVE,
+    VACCINATED and INFECTED bits. The person with _id i is at slot i - 1, so ids are
+    never stored. Indexing a slot returns a PersonView of it.
+
+    The codes are a bytearray, which Python indexes much faster than a NumPy array,
+    and states is a NumPy array over the same memory for whole-population work.
+    '''
+
+    def __init__(self, states, virus):
+        self.codes = bytearray(states) # State code of every slot
+        self.states = np.frombuffer(self.codes, dtype=np.uint8) # The codes as an array
+        self.virus = virus # Virus object every infected person has
+
+    @classmethod
+    def from_masks(cls, alive, vaccinated, infected, virus):
+        '''Packs boolean arrays of each state into a new store.'''
+        store = cls(alive.view(np.uint8), virus)
+        store.states |= vaccinated.view(np.uint8) << 1
+        store.states |= infected.view(np.uint8) << 2
+        return store
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, slot):
+        return PersonView(self, slot)
+
+    def mask(self, flag):
+        '''Returns a boolean array of whether each person has the flag set.'''
+        return (self.states & flag).astype(bool)
+
+
+class PersonView(object):
+    ''' Stands in for the Person at one slot of a PopulationStore, with the same
+    attributes and did_survive_infection, read from and written to its state code.
+    Views are made when needed and hold nothing but the store and slot.
+    '''
+    __slots__ = ('store', 'slot')
+
+    def __init__(self, store, slot):
+        self.store = store # PopulationStore
+        self.slot = slot # Int
+
+    def _set(self, flag, value):
+        if value:
+            self.store.codes[self.slot] |= flag
+        else:
+            self.store.codes[self.slot] &= ~flag
+
+    @property
+    def _id(self):
+        return self.slot + 1
+
+    @property
+    def is_alive(self):
+        return bool(self.store.codes[self.slot] & ALIVE)
+
+    @is_alive.setter
+    def is_alive(self, value):
+        self._set(ALIVE, value)
+
+    @property
+    def is_vaccinated(self):
+        return bool(self.store.codes[self.slot] & VACCINATED)
+
+    @is_vaccinated.setter
+    def is_vaccinated(self, value):
+        self._set(VACCINATED, value)
+
+    @property
+    def infection(self):
+        return self.store.virus if self.store.codes[self.slot] & INFECTED else None
+
+    @infection.setter
+    def infection(self, virus):
+        self._set(INFECTED, virus is not None)
+
+    def did_survive_infection(self, rng=random):
+        '''Same as Person.did_survive_infection.'''
+        survived = rng.random() >= self.store.virus.mortality_rate
+        self.is_vaccinated = True
+        self.infection = None
+        if not survived:
+            self.is_alive = False
+        return survived
@@ -0,0 +1,46 @@
+import random, sys
+random.seed(42)
+import numpy as np
+from virus import Virus
+from population import seed_mask, seed_population, PopulationStore, ALIVE, VACCINATED, INFECTED
+import pytest
+
+
+def test_seed_mask_counts():
+    rng = np.random.default_rng(1)
+    for size, count, chunk_size in [(1000, 0, 64), (1000, 1000, 64), (1000, 37, 64), (10, 3, 100)]:
+        mask = seed_mask(rng, np.ones(size, dtype=bool), count, chunk_size)
+        assert np.count_nonzero(mask) == count
+    with pytest.raises(ValueError):
+        seed_mask(rng, np.empty(10, dtype=bool), 11)
+    #Checked before anything is written, so a read-only view stands in for the mask
+    huge = np.broadcast_to(False, (10 ** 9 + 2 ** 20,))
+    with pytest.raises(ValueError):
+        seed_mask(rng, huge, 1)
+
+def test_seed_mask_uniform():
+    #Every person is as likely to be picked, whichever chunk they are in
+    rng = np.random.default_rng(2)
+    hits = np.zeros(100)
+    for _ in range(2000):
+        hits += seed_mask(rng, np.empty(100, dtype=bool), 10, chunk_size=30)
+    assert np.allclose(hits / 2000, 0.1, atol=0.03)
+
+def test_seed_population():
+    vaccinated, infected = seed_population(np.random.default_rng(3), 5000, 4000, 10, chunk_size=512)
+    assert np.count_nonzero(vaccinated) == 4000
+    assert np.count_nonzero(infected) == 10
+
+def test_population_store_views():
+    virus = Virus("Smallpox", 0.2, 0.0)
+    store = PopulationStore.from_masks(np.array([True, True, False]),
+        np.array([False, True, False]), np.array([True, False, False]), virus)
+    assert list(store.states) == [ALIVE | INFECTED, ALIVE | VACCINATED, 0]
+    person = store[0]
+    assert person._id == 1 and person.is_alive and not person.is_vaccinated
+    assert person.infection is virus
+    assert person.did_survive_infection()
+    assert person.infection is None and person.is_vaccinated
+    store[1].is_alive = False
+    assert list(store.mask(ALIVE)) == [True, False, False]
+    assert list(store.mask(VACCINATED)) == [True, True, False]
@@ -0,0 +1,48 @@
+import random, sys
+random.seed(42)
+import csv
+import json
+from logger import Logger, LOG_SUMMARY
+from virus import Virus
+from simulation import Simulation
+from array_simulation import ArraySimulation
+from profiler import PhaseProfiler
+import pytest
+
+
+def test_profile_person_engine(tmp_path):
+    virus = Virus("Smallpox", 0.2, 0.15)
+    sim = Simulation(300, 0.50, virus, logger=Logger(str(tmp_path / "logs.txt"),
+        str(tmp_path / "logs_formatting.txt"), log_level=LOG_SUMMARY))
+    profiler = PhaseProfiler(sim).attach()
+    steps = list(sim.iter_steps())
+    profiler.detach()
+    assert 'interaction' not in sim.__dict__ and 'log_time_step' not in sim.logger.__dict__
+    assert [row['step'] for row in profiler.steps] == [stats.step for stats in steps]
+    first = profiler.steps[0]
+    assert first['_sample_contact_calls'] == first['interaction_calls'] == 100 * sim.initial_infected
+    assert first['_resolve_infection_calls'] == sim.initial_infected
+    assert first['time_step_calls'] == first['log_time_step_calls'] == 1
+    assert first['seconds'] == pytest.approx(sum(first[f'{phase}_seconds']
+        for phase in profiler.phases))
+    assert profiler.summary()[0][1] >= profiler.summary()[-1][1]
+
+def test_profile_array_engine(tmp_path):
+    virus = Virus("Smallpox", 0.2, 0.15)
+    sim = ArraySimulation(1000, 0.50, virus, logger=Logger(str(tmp_path / "logs.txt"),
+        str(tmp_path / "logs_formatting.txt")))
+    profiler = PhaseProfiler(sim).attach()
+    steps = list(sim.iter_steps())
+    profiler.detach()
+    assert len(profiler.steps) == len(steps)
+    assert profiler.steps[0]['log_interactions_calls'] == 1
+    assert 'interaction' not in [row[0] for row in profiler.summary()]
+    assert 'steps in' in profiler.summary_table()
+
+    profiler.write(str(tmp_path / "profile.json"))
+    with open(tmp_path / "profile.json") as profile:
+        assert len(json.load(profile)['steps']) == len(steps)
+    profiler.write(str(tmp_path / "profile.csv"))
+    with open(tmp_path / "profile.csv") as profile:
+        rows = list(csv.DictReader(profile))
+    assert [int(row['newly_infected']) for row in rows] == [stats.newly_infected for stats in steps]
@@ -0,0 +1,183 @@
+''' Columnar store of the per-step series and final answers of many runs.
+
+A store is a directory:
+    runs.jsonl          one line per finished run: its run id, row, params and number
+                        of steps
+    chunks.i64          row i holds where run i's chunk of each of SERIES_COLUMNS is,
+                        as offset and length pairs of int64
+    columns/NAME.zcol   the chunks of one series column, one per run, appended
+    answers/NAME.i64    one answer column, the int64 answer of run i at byte 8 * i
+
+Each chunk holds one run's values of one series column as delta encoded int64,
+compressed with zlib. The cumulative series barely change from step to step, so
+their deltas compress to a few bytes per step. The answers are one value per run,
+which compresses to nothing, so they are kept as fixed width columns instead and
+read through memory maps. Queries only parse the runs and params in runs.jsonl, a
+line at a time, then read the rows and columns they ask for from the binary files.
+
+A Logger made with results_store=ResultsStore(directory) adds every run it logs,
+see RunWriter. Only one process should write to a store at a time.
+'''
+
+import json
+import os
+import uuid
+import zlib
+import numpy as np
+
+#Values of Logger.log_time_step, in order
+SERIES_COLUMNS = ('step', 'total_dead', 'current_infected', 'total_infected',
+    'newly_infected', 'dead_this_step')
+#Values of Logger.log_answers besides the params
+ANSWER_COLUMNS = ('total_dead', 'total_infected', 'saved_from_vac')
+#Bytes of an int64, and the int64 of a row of chunks.i64: offset and length of each column
+INT64_BYTES = 8
+CHUNK_ROW = 2 * len(SERIES_COLUMNS)
+
+
+def encode_column(values):
+    '''Returns values as a delta encoded, zlib compressed chunk of int64.'''
+    values = np.asarray(values, dtype=np.int64)
+    return zlib.compress(np.diff(values, prepend=0).tobytes())
+
+
+def decode_column(chunk):
+    '''Returns the int64 array encode_column stored in chunk.'''
+    return np.cumsum(np.frombuffer(zlib.decompress(chunk), dtype=np.int64))
+
+
+class RunWriter(object):
+    ''' Gathers the series of one run until it is finished and added to the store. '''
+
+    def __init__(self, store, run_id, params):
+        self.store = store # ResultsStore
+        self.run_id = run_id # String
+        self.params = params # Dict of the run's inputs
+        self.series = {name: [] for name in SERIES_COLUMNS} # Values of each step
+
+    def append_step(self, *values):
+        '''Adds one step's values of SERIES_COLUMNS.'''
+        for name, value in zip(SERIES_COLUMNS, values):
+            self.series[name].append(value)
+
+    def finish(self, answers):
+        '''Adds the run with its dict of answers to the store, and returns its run record.'''
+        return self.store.add_run(self.run_id, self.params, self.series, answers)
+
+
+class ResultsStore(object):
+    ''' Directory of runs in the format of the module docstring. '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, 'columns'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'answers'), exist_ok=True)
+
+    @property
+    def runs_path(self):
+        return os.path.join(self.directory, 'runs.jsonl')
+
+    @property
+    def chunks_path(self):
+        return os.path.join(self.directory, 'chunks.i64')
+
+    def column_path(self, name):
+        return os.path.join(self.directory, 'columns', name + '.zcol')
+
+    def answer_path(self, name):
+        return os.path.join(self.directory, 'answers', name + '.i64')
+
+    def start_run(self, params, run_id=None):
+        '''Returns a RunWriter for a new run with params, under a new run id by default.'''
+        return RunWriter(self, run_id or uuid.uuid4().hex, params)
+
+    def add_run(self, run_id, params, series, answers):
+        ''' Appends a run's chunk to every series column, its row to chunks.i64 and
+        every answer column, then its record to runs.jsonl. A run only shows up once its
+        record is written, so a run cut off halfway leaves nothing but unused bytes, and
+        a row the next run writes over.
+        '''
+        row = len(self._read_rows(self.chunks_path, CHUNK_ROW))
+        chunks = []
+        for name in SERIES_COLUMNS:
+            chunk = encode_column(series.get(name, []))
+            with open(self.column_path(name), 'ab') as column:
+                chunks += [column.tell(), len(chunk)]
+                column.write(chunk)
+        self._write_row(self.chunks_path, row * CHUNK_ROW, chunks)
+        for name, value in answers.items():
+            self._write_row(self.answer_path(name), row, [value])
+        record = {'run_id': run_id, 'row': row, 'params': params,
+            'steps': len(series.get(SERIES_COLUMNS[0], []))}
+        with open(self.runs_path, 'a') as runs:
+            runs.write(json.dumps(record) + '\n')
+        return record
+
+    @staticmethod
+    def _write_row(path, position, values):
+        '''Writes values as int64 from the position-th int64 of path, over anything there.'''
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as column:
+            column.seek(position * INT64_BYTES)
+            column.write(np.array(values, dtype=np.int64).tobytes())
+
+    @staticmethod
+    def _read_rows(path, width):
+        '''Returns a read only memory map of the whole rows of width int64 in path.'''
+        try:
+            rows = os.path.getsize(path) // (INT64_BYTES * width)
+        except FileNotFoundError:
+            rows = 0
+        if not rows:
+            return np.empty((0, width), dtype=np.int64)
+        return np.memmap(path, dtype=np.int64, mode='r', shape=(rows, width))
+
+    def runs(self, **params):
+        '''Yields the records of every run whose params have the given values, in the
+        order they were added.
+        '''
+        try:
+            runs = open(self.runs_path)
+        except FileNotFoundError:
+            return
+        with runs:
+            for line in runs:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if all(record['params'].get(name) == value for name, value in params.items()):
+                    yield record
+
+    def iter_series(self, columns=SERIES_COLUMNS, runs=None):
+        ''' Yields (run record, {column: array}) for each of runs, by default every run,
+        reading only the chunks of columns. Only one run is held at a time.
+        '''
+        runs = self.runs() if runs is None else runs
+        chunks = self._read_rows(self.chunks_path, CHUNK_ROW)
+        handles = {}
+        try:
+            for record in runs:
+                values = {}
+                for name in columns:
+                    if name not in handles:
+                        handles[name] = open(self.column_path(name), 'rb')
+                    position = 2 * SERIES_COLUMNS.index(name)
+                    offset, length = chunks[record['row'], position:position + 2]
+                    handles[name].seek(offset)
+                    values[name] = decode_column(handles[name].read(length))
+                yield record, values
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+    def series(self, columns=SERIES_COLUMNS, runs=None):
+        '''Returns {run id: {column: array}} for runs, see iter_series.'''
+        return {record['run_id']: values for record, values in self.iter_series(columns, runs)}
+
+    def answers(self, columns=ANSWER_COLUMNS, runs=None):
+        '''Returns {column: array} of the answers of runs, by default every run, one
+        value per run in order. Only the rows of runs in columns are read.
+        '''
+        runs = self.runs() if runs is None else runs
+        rows = np.fromiter((record['row'] for record in runs), dtype=np.int64)
+        return {name: np.array(self._read_rows(self.answer_path(name), 1)[rows, 0])
+            for name in columns}
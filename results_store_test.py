@@ -0,0 +1,64 @@
+import random, sys
+random.seed(42)
+import os
+import numpy as np
+from logger import Logger, LOG_NONE
+from virus import Virus
+from array_simulation import ArraySimulation
+from results_store import ResultsStore, encode_column, decode_column, SERIES_COLUMNS
+import pytest
+
+
+def test_encode_column():
+    values = [0, 5, 5, 9, 2 ** 40, -3]
+    assert list(decode_column(encode_column(values))) == values
+    assert len(decode_column(encode_column([]))) == 0
+
+def test_add_and_query_runs(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    for run_id, pop_size in [('a', 100), ('b', 200), ('c', 100)]:
+        run = store.start_run({'pop_size': pop_size}, run_id=run_id)
+        for step in range(1, pop_size // 50 + 1):
+            run.append_step(step, step * 2, 1, step * 3, 1, 2)
+        run.finish({'total_dead': pop_size // 10, 'total_infected': 7, 'saved_from_vac': 0})
+    assert [record['run_id'] for record in store.runs(pop_size=100)] == ['a', 'c']
+    series = store.series(['total_dead'], store.runs(pop_size=200))
+    assert list(series) == ['b']
+    assert list(series['b']['total_dead']) == [2, 4, 6, 8]
+    assert list(store.answers(['total_dead'])['total_dead']) == [10, 20, 10]
+    assert list(store.answers(runs=store.runs(pop_size=200))['total_infected']) == [7]
+    #One int64 per run, at the run's row
+    assert os.path.getsize(store.answer_path('saved_from_vac')) == 3 * 8
+    assert [record['row'] for record in store.runs()] == [0, 1, 2]
+    #Reopening the directory finds the same runs
+    assert list(ResultsStore(str(tmp_path)).runs()) == list(store.runs())
+
+def test_run_cut_off_is_written_over(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    store.add_run('a', {}, {'step': [1, 2]}, {'total_dead': 3})
+    #A run that died after writing its row and some answers, but not its record
+    with open(store.chunks_path, 'ab') as chunks:
+        chunks.write(b'\0' * 20)
+    with open(store.answer_path('total_dead'), 'ab') as answers:
+        answers.write(b'\1' * 8)
+    store.add_run('b', {}, {'step': [1, 2, 3]}, {'total_dead': 5})
+    assert [record['row'] for record in store.runs()] == [0, 1]
+    assert list(store.answers(['total_dead'])['total_dead']) == [3, 5]
+    assert list(store.series(['step'])['b']['step']) == [1, 2, 3]
+
+def test_logger_adds_runs(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    virus = Virus("Smallpox", 0.2, 0.15)
+    for seed in (1, 2):
+        logger = Logger(os.devnull, os.devnull, log_level=LOG_NONE, results_store=store,
+            run_params={'seed': seed})
+        sim = ArraySimulation(1000, 0.5, virus, logger=logger, seed=seed)
+        sim.run(plot=False)
+    records = list(store.runs(seed=2))
+    assert len(records) == 1
+    assert records[0]['params']['pop_size'] == 1000
+    assert list(store.answers(runs=records)['total_dead']) == [sim.total_dead]
+    values = store.series(SERIES_COLUMNS, records)[records[0]['run_id']]
+    assert list(values['step']) == list(range(1, sim.time_step_counter + 1))
+    assert [sim.initial_infected] + list(values['current_infected']) == sim.plot_y
+    assert list(values['total_dead']) == sim.plot_y2[1:]
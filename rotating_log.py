@@ -0,0 +1,309 @@
+''' Gzip compressed logs split into numbered segments of bounded size.
+
+A log written to logs.txt with Logger(compress=True) is kept as
+    logs.txt.000000.gz, logs.txt.000001.gz, ...   the segments, each a gzip file
+    logs.txt.index.jsonl                          one line per finished segment
+    logs.txt.000001.steps                         journal of the segment being written
+
+A segment is closed once its compressed size reaches segment_bytes and the next
+write starts a new one. Its index line holds its number, the run it belongs to, the
+first and last time step it covers, its uncompressed size and the offset in its
+uncompressed data of every step that starts in it. A segment is only indexed once
+it is closed: when it is full, at a new run or when the Logger is closed. Each new
+run starts a new segment and earlier runs are kept, so starting a run no longer
+wipes the last one's log.
+
+Until then, the start of every step flushes the segment to disk and adds the step's
+offset to the segment's journal. If the process dies before the segment is closed,
+the next RotatingLog on the log indexes it from its journal, up to the start of the
+last step it began, and never writes to it again. Only the step being written when
+the process died is lost.
+
+LogReader finds the segment a step starts in from the index and only decompresses
+that segment up to the step, not the log before it:
+    python3 rotating_log.py logs.txt --step 12
+'''
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import zlib
+
+#Compressed size a segment is closed at
+SEGMENT_BYTES = 64 * 1024 * 1024
+#Bytes decompressed at a time when reading
+READ_SIZE = 1024 * 1024
+
+
+def segment_name(file_name, number):
+    return f'{file_name}.{number:06d}.gz'
+
+
+def journal_name(file_name, number):
+    return f'{file_name}.{number:06d}.steps'
+
+
+def index_name(file_name):
+    return f'{file_name}.index.jsonl'
+
+
+def read_index(file_name):
+    '''Returns the index entries of the log written to file_name, oldest first.'''
+    try:
+        with open(index_name(file_name)) as index:
+            return [json.loads(line) for line in index if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def segment_files(file_name):
+    '''Returns (number, path) of every segment and journal file of the log, by number.'''
+    directory, base = os.path.split(os.path.abspath(file_name))
+    pattern = re.escape(base) + r'\.(\d{6})\.(gz|steps)'
+    files = []
+    for name in os.listdir(directory):
+        match = re.fullmatch(pattern, name)
+        if match:
+            files.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(files)
+
+
+def _readable_size(path):
+    '''Returns how many bytes of the gzip file at path decompress, trailer or not.'''
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    size = 0
+    with open(path, 'rb') as segment:
+        data = segment.read(READ_SIZE)
+        while data and not decompressor.eof:
+            try:
+                size += len(decompressor.decompress(data))
+            except zlib.error:
+                break
+            data = segment.read(READ_SIZE)
+    return size
+
+
+def recover(file_name):
+    ''' Indexes the segments a process died writing, from their journals, up to the
+    start of the last step each began. Returns the number of the next new segment,
+    past every segment file, indexed or not.
+    '''
+    indexed = set(entry['segment'] for entry in read_index(file_name))
+    for number, path in segment_files(file_name):
+        if not path.endswith('.steps'):
+            continue
+        with open(path) as journal:
+            lines = [json.loads(line) for line in journal if line.endswith('\n')]
+        #A journal cut off before its first line has nothing to recover
+        if number not in indexed and lines:
+            entry = lines[0]
+            steps = lines[1:]
+            #Everything before the last step's start was flushed before it was journaled
+            size = steps[-1][1] if steps else 0
+            size = min(size, _readable_size(segment_name(file_name, number)))
+            entry['steps'] = {str(step): offset for step, offset in steps if offset < size}
+            entry['last_step'] = max([entry['first_step']] + [int(step)
+                for step in entry['steps']])
+            entry['size'] = size
+            if size:
+                with open(index_name(file_name), 'a') as index:
+                    index.write(json.dumps(entry) + '\n')
+        os.remove(path)
+    numbers = [number for number, _ in segment_files(file_name)] + list(indexed)
+    return max(numbers) + 1 if numbers else 0
+
+
+def truncate(file_name, number):
+    '''Drops segment number and every later one from the log and its index.'''
+    entries = [entry for entry in read_index(file_name) if entry['segment'] < number]
+    temporary = index_name(file_name) + '.tmp'
+    with open(temporary, 'w') as index:
+        index.writelines(json.dumps(entry) + '\n' for entry in entries)
+    os.replace(temporary, index_name(file_name))
+    for segment, path in segment_files(file_name):
+        if segment >= number:
+            os.remove(path)
+
+
+class RotatingLog(object):
+    ''' Writer of a segmented gzip log, used by Logger in place of a file handle.
+    Recovers segments left unindexed by a crash, then continues the last run in the
+    index, new_run() starts another one.
+    '''
+
+    def __init__(self, file_name, segment_bytes=SEGMENT_BYTES, compresslevel=6):
+        self.file_name = file_name
+        self.segment_bytes = segment_bytes # Int
+        self.compresslevel = compresslevel # Int, 1 is fastest and 9 smallest
+        self.number = recover(file_name) # Number of the next segment
+        entries = read_index(file_name)
+        self.run = entries[-1]['run'] if entries else 0 # Int
+        self.run_started = bool(entries) # Bool, the run has segments
+        self.last_step = entries[-1]['last_step'] if entries else None # Step of the last write
+        self._raw = None
+        self._gzip = None
+        self._journal = None
+        self._entry = None # Index entry of the open segment
+
+    def new_run(self):
+        '''Closes the segment being written and starts a new run.'''
+        self._close_segment()
+        if self.run_started:
+            self.run += 1
+            self.run_started = False
+        self.last_step = None
+
+    def write(self, data, step):
+        '''Appends data, text or bytes, logged during time step step.'''
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if self._gzip is None:
+            self._open_segment(step)
+        if step != self.last_step:
+            self._start_step(step)
+        self._entry['last_step'] = step
+        self._gzip.write(data)
+        if self._raw.tell() >= self.segment_bytes:
+            self._close_segment()
+
+    def _start_step(self, step):
+        '''Flushes the steps before step to disk, then journals where step starts.'''
+        self._gzip.flush()
+        offset = self._gzip.tell()
+        self._journal.write(json.dumps([step, offset]) + '\n')
+        self._journal.flush()
+        self._entry['steps'][str(step)] = offset
+        self.last_step = step
+
+    def _open_segment(self, step):
+        self._raw = open(segment_name(self.file_name, self.number), 'xb')
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=self.compresslevel)
+        self._entry = {'segment': self.number, 'run': self.run, 'first_step': step,
+            'last_step': step, 'steps': {}}
+        self._journal = open(journal_name(self.file_name, self.number), 'w')
+        self._journal.write(json.dumps(self._entry) + '\n')
+        self._journal.flush()
+        self.number += 1
+        self.run_started = True
+
+    def _close_segment(self):
+        '''Finishes the open segment, if any, and adds it to the index.'''
+        if self._gzip is None:
+            return
+        self._entry['size'] = self._gzip.tell()
+        self._gzip.close()
+        self._raw.close()
+        with open(index_name(self.file_name), 'a') as index:
+            index.write(json.dumps(self._entry) + '\n')
+        self._journal.close()
+        os.remove(journal_name(self.file_name, self._entry['segment']))
+        self._gzip = self._raw = self._journal = self._entry = None
+
+    def end_segment(self):
+        '''Closes the open segment, so the next write starts a new one, and returns
+        the number of that one.
+        '''
+        self._close_segment()
+        return self.number
+
+    def flush(self):
+        if self._gzip is not None:
+            self._gzip.flush()
+
+    def close(self):
+        self._close_segment()
+
+
+class LogReader(object):
+    ''' Reads the segments of a log written by RotatingLog, using its index. '''
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.segments = read_index(file_name) # Index entries, oldest first
+
+    def runs(self):
+        '''Returns the numbers of the runs in the log.'''
+        return sorted(set(entry['run'] for entry in self.segments))
+
+    def _run_segments(self, run):
+        run = self.runs()[-1] if run is None else run
+        return [entry for entry in self.segments if entry['run'] == run]
+
+    def _start(self, segments, step):
+        '''Returns the index in segments and offset where step starts, or None.'''
+        for position, entry in enumerate(segments):
+            if str(step) in entry['steps']:
+                return position, entry['steps'][str(step)]
+        return None
+
+    def _end(self, segments, last):
+        '''Returns the index in segments and offset of the first step after last, or None.'''
+        for position, entry in enumerate(segments):
+            for step, offset in entry['steps'].items():
+                if int(step) > last:
+                    return position, offset
+        return None
+
+    def iter_from(self, step=1, run=None):
+        ''' Yields the bytes of a run, by default the last one, from the start of
+        step to the end. Raises ValueError if the step was not logged.
+        '''
+        segments = self._run_segments(run)
+        start = self._start(segments, step)
+        if start is None:
+            raise ValueError(f'Step {step} is not in the log')
+        position, offset = start
+        for entry in segments[position:]:
+            with gzip.open(segment_name(self.file_name, entry['segment'])) as segment:
+                #Seeking decompresses the segment up to the offset, and nothing before it
+                segment.seek(offset)
+                #Recovered segments end in a partial step, which is not read
+                remaining = entry['size'] - offset
+                offset = 0
+                while remaining > 0:
+                    data = segment.read(min(READ_SIZE, remaining))
+                    if not data:
+                        break
+                    remaining -= len(data)
+                    yield data
+
+    def read_steps(self, first, last=None, run=None):
+        '''Returns the bytes logged from step first to step last, by default first only.'''
+        last = first if last is None else last
+        segments = self._run_segments(run)
+        start, end = self._start(segments, first), self._end(segments, last)
+        if start is None or end is None:
+            return b''.join(self.iter_from(first, run))
+        #The bytes before the start of the step after last, counted from the start of step first
+        position, offset = start
+        end_position, end_offset = end
+        length = -offset + end_offset + sum(entry['size']
+            for entry in segments[position:end_position])
+        data = []
+        for chunk in self.iter_from(first, run):
+            data.append(chunk[:length])
+            length -= len(data[-1])
+            if length <= 0:
+                break
+        return b''.join(data)
+
+
+if __name__ == "__main__":
+    #python3 rotating_log.py logs.txt --step 12
+    parser = argparse.ArgumentParser(description='Prints part of a compressed log.')
+    parser.add_argument('file_name', help='log file name the segments were written under')
+    parser.add_argument('--step', type=int, default=1, help='first time step to print')
+    parser.add_argument('--last', type=int, default=None,
+        help='last time step to print, by default everything after --step')
+    parser.add_argument('--run', type=int, default=None, help='run to read, by default the last')
+    args = parser.parse_args()
+
+    reader = LogReader(args.file_name)
+    if args.last is None:
+        for chunk in reader.iter_from(args.step, args.run):
+            sys.stdout.buffer.write(chunk)
+    else:
+        sys.stdout.buffer.write(reader.read_steps(args.step, args.last, args.run))
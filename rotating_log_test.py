@@ -0,0 +1,93 @@
+import random, sys
+random.seed(42)
+import os
+import re
+import subprocess
+from logger import Logger
+from virus import Virus
+from simulation import Simulation
+from rotating_log import RotatingLog, LogReader, read_index, segment_name
+import pytest
+
+
+def write_steps(log, steps, line_count):
+    for step in steps:
+        for line in range(line_count):
+            log.write(f'{step} line {line} {random.random()}\n', step)
+
+def test_rotation_and_index(tmp_path):
+    file_name = str(tmp_path / 'logs.txt')
+    log = RotatingLog(file_name, segment_bytes=20000)
+    write_steps(log, range(1, 21), 500)
+    log.close()
+    entries = read_index(file_name)
+    assert len(entries) > 2
+    assert [entry['segment'] for entry in entries] == list(range(len(entries)))
+    assert entries[0]['first_step'] == 1 and entries[-1]['last_step'] == 20
+    #Segments end at the first write past the size, zlib holds back up to a block
+    for entry in entries:
+        assert os.path.getsize(segment_name(file_name, entry['segment'])) < 20000 + 65536
+    reader = LogReader(file_name)
+    text = b''.join(reader.iter_from(1)).decode()
+    assert len(text.splitlines()) == 20 * 500
+    for step in (1, 7, 20):
+        lines = reader.read_steps(step).decode().splitlines()
+        assert len(lines) == 500 and all(line.startswith(f'{step} line') for line in lines)
+    assert b''.join(reader.iter_from(20)).decode() == reader.read_steps(20).decode()
+    with pytest.raises(ValueError):
+        reader.read_steps(21)
+
+def test_runs_are_kept(tmp_path):
+    file_name = str(tmp_path / 'logs.txt')
+    for run in range(2):
+        log = RotatingLog(file_name)
+        log.new_run()
+        write_steps(log, [1, 2], 3)
+        log.close()
+    reader = LogReader(file_name)
+    assert reader.runs() == [0, 1]
+    assert len(reader.read_steps(1, 2, run=0).decode().splitlines()) == 6
+
+@pytest.mark.parametrize('buffered', [False, True])
+def test_compressed_logger(tmp_path, buffered):
+    file_name = str(tmp_path / 'logs.txt')
+    virus = Virus("Smallpox", 0.2, 0.15)
+    logger = Logger(file_name, str(tmp_path / 'formatting.txt'), buffered=buffered,
+        batch_size=10, compress=True, segment_bytes=20000)
+    sim = Simulation(500, 0.5, virus, logger=logger)
+    sim.run(plot=False)
+    assert not os.path.exists(file_name)
+    reader = LogReader(file_name)
+    text = b''.join(reader.iter_from(1)).decode()
+    assert text.startswith('Population Size')
+    #Every step holds its interactions and ends with its summary
+    for step in range(1, sim.time_step_counter + 1):
+        step_text = reader.read_steps(step).decode()
+        assert re.search(rf'Time step {step} ended', step_text)
+        assert f'Time step {step - 1} ended' not in step_text
+
+def test_binary_logs_are_not_compressed(tmp_path):
+    #event_log.py reads binary logs from one file, not from segments
+    with pytest.raises(ValueError):
+        Logger(str(tmp_path / 'logs.bin'), os.devnull, log_format='binary', compress=True)
+
+def test_crashed_segments_are_recovered(tmp_path):
+    file_name = str(tmp_path / 'logs.txt')
+    #Dies writing step 3, without closing anything
+    code = ('import os, sys; sys.path.insert(0, sys.argv[2]); from rotating_log import RotatingLog\n'
+        'log = RotatingLog(sys.argv[1])\n'
+        'for step in (1, 2, 3):\n'
+        '    log.write(f"step {step}\\n", step)\n'
+        'os._exit(0)\n')
+    subprocess.run([sys.executable, '-c', code, file_name, os.path.dirname(__file__)], check=True)
+    assert read_index(file_name) == []
+    log = RotatingLog(file_name)
+    assert log.number == 1
+    write_steps(log, [4], 1)
+    log.close()
+    #The crashed segment is indexed up to the step it died in and never overwritten
+    assert [entry['segment'] for entry in read_index(file_name)] == [0, 1]
+    assert not os.path.exists(file_name + '.000000.steps')
+    reader = LogReader(file_name)
+    assert reader.read_steps(1, 2) == b'step 1\nstep 2\n'
+    assert b''.join(reader.iter_from(1)).decode().startswith('step 1\nstep 2\n4 line 0')
@@ -0,0 +1,357 @@
+''' Local HTTP/JSON service that runs simulation jobs on a pool of worker processes.
+
+A job is a config like sweep.py's grid points plus a seed, posted as JSON. Inputs
+left out take the defaults of sweep.GRID_DEFAULTS and the seed defaults to 0. Besides
+those, only the config options of the chosen engine are accepted, like the shards of
+the sharded engine, and inputs of the wrong type or out of range get a 400:
+    POST /jobs              {"pop_size": 5000, "vacc_percentage": 0.8, "seed": 3}
+                            returns {"job_id": ..., "status": "queued", ...}
+    GET  /jobs              every job and its status
+    GET  /jobs/ID           a job's status, and its result once done
+    GET  /jobs/ID/progress  one JSON line per time step, streamed until the job ends,
+                            then a last line with the job's status
+
+Results are the dicts of ensemble.run_replicate, kept in a result cache under
+sweep.cache_key, so the same config and seed is only ever run once. The least
+recently used results are deleted once the cache holds max_entries of them, and a
+job whose result was deleted reports a null result. Jobs only keep their status,
+the result is read from the cache when asked for. Once more than max_jobs jobs have
+ended the oldest are forgotten, with their progress files.
+The server only listens on localhost.
+'''
+
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ensemble import run_replicate
+from logger import Logger, LOG_NONE
+from simulation import ENGINES, load_engine
+from sweep import GRID_DEFAULTS, ResultCache, cache_key
+
+#Seconds between checks of a running job's progress file
+POLL_INTERVAL = 0.2
+#Type of each job input, besides the options of its engine
+INPUT_TYPES = {'pop_size': int, 'vacc_percentage': float, 'virus_name': str,
+    'mortality_rate': float, 'repro_rate': float, 'initial_infected': int, 'engine': str}
+#Inputs that are chances
+RATES = ('vacc_percentage', 'mortality_rate', 'repro_rate')
+
+
+class LRUResultCache(ResultCache):
+    ''' ResultCache that keeps at most max_entries results, deleting the least
+    recently used first. Reading a result touches its file, so the order survives
+    restarts.
+    '''
+
+    def __init__(self, directory, max_entries=10000):
+        super().__init__(directory)
+        self.max_entries = max_entries # Int
+        self._lock = threading.Lock()
+        #Every cached key, least recently used first
+        self._order = collections.OrderedDict()
+        entries = []
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith('.json'):
+                    entries.append((os.path.getmtime(os.path.join(root, name)), name[:-5]))
+        for _, key in sorted(entries):
+            self._order[key] = None
+        self._evict()
+
+    def __len__(self):
+        return len(self._order)
+
+    def get(self, key):
+        '''Returns the stored result for key, or None, and marks it as just used.'''
+        result = super().get(key)
+        if result is not None:
+            with self._lock:
+                self._order[key] = None
+                self._order.move_to_end(key)
+            try:
+                os.utime(self.path(key))
+            except FileNotFoundError:
+                pass
+        return result
+
+    def put(self, key, result):
+        '''Stores result under key, then evicts results over max_entries.'''
+        super().put(key, result)
+        with self._lock:
+            self._order[key] = None
+            self._order.move_to_end(key)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            while len(self._order) > self.max_entries:
+                key, _ = self._order.popitem(last=False)
+                try:
+                    os.remove(self.path(key))
+                except FileNotFoundError:
+                    pass
+
+
+class ProgressLogger(Logger):
+    ''' Logger that writes nothing but a JSON line per time step to file_name. '''
+
+    def __init__(self, file_name):
+        super().__init__(file_name, os.devnull, log_level=LOG_NONE)
+
+    def log_time_step(self, time_step_number, total_dead, current_infected,
+        total_infected, newly_infected, dead_this_step):
+        super().log_time_step(time_step_number, total_dead, current_infected,
+            total_infected, newly_infected, dead_this_step)
+        line = json.dumps({'step': time_step_number, 'current_infected': current_infected,
+            'newly_infected': newly_infected, 'dead_this_step': dead_this_step,
+            'total_infected': total_infected, 'total_dead': total_dead})
+        with open(self.file_name, 'a') as progress:
+            progress.write(line + '\n')
+
+
+def run_job(config, seed, progress_path):
+    '''Pool worker: runs one job, writing its progress to progress_path.'''
+    #The file exists from the moment the job starts, which marks it as running
+    open(progress_path, 'w').close()
+    return run_replicate(config, seed, logger=ProgressLogger(progress_path))
+
+
+def _check_type(name, value, kind):
+    '''Raises ValueError unless value is of type kind, any number for a float.'''
+    kinds = (int, float) if kind is float else kind
+    if isinstance(value, bool) or not isinstance(value, kinds):
+        raise ValueError(f'{name} must be of type {kind.__name__}, not {value!r}')
+
+
+def job_config(spec):
+    ''' Returns the config and seed of a job spec, or raises ValueError for unknown
+    inputs, inputs of the wrong type or out of range, so bad jobs are turned away
+    before they reach a worker.
+    '''
+    if not isinstance(spec, dict):
+        raise ValueError('A job spec must be a JSON object')
+    spec = dict(spec)
+    seed = spec.pop('seed', 0)
+    _check_type('seed', seed, int)
+    config = dict(GRID_DEFAULTS, **spec)
+    if config['engine'] not in ENGINES:
+        raise ValueError(f"Unknown engine {config['engine']!r}")
+    types = dict(INPUT_TYPES, **load_engine(config['engine']).config_options)
+    unknown = set(config) - set(types)
+    if unknown:
+        raise ValueError(f'Unknown job inputs: {", ".join(sorted(unknown))}')
+    for name, value in config.items():
+        _check_type(name, value, types[name])
+    for name in RATES:
+        if not 0 <= config[name] <= 1:
+            raise ValueError(f'{name} must be between 0 and 1, not {config[name]}')
+    if config['pop_size'] < 1:
+        raise ValueError(f"pop_size must be at least 1, not {config['pop_size']}")
+    if not 0 <= config['initial_infected'] <= config['pop_size']:
+        raise ValueError(f"initial_infected must be between 0 and pop_size, "
+            f"not {config['initial_infected']}")
+    return config, seed
+
+
+class JobService(object):
+    ''' Queue of simulation jobs run on a multiprocessing pool, with their results
+    kept in an LRUResultCache. Safe to use from several server threads.
+    '''
+
+    def __init__(self, cache_dir, job_dir, processes=None, max_entries=10000, max_jobs=10000):
+        self.cache = LRUResultCache(cache_dir, max_entries)
+        self.job_dir = job_dir # Directory of the progress file of every job
+        os.makedirs(job_dir, exist_ok=True)
+        self.pool = multiprocessing.Pool(processes)
+        self.max_jobs = max_jobs # Int, ended jobs kept before the oldest are forgotten
+        self.jobs = {} # Job dicts by job id, without their results
+        self._running = {} # Job id of each cache key being run
+        self._ended = collections.deque() # Ids of the ended jobs, oldest first
+        self._lock = threading.Lock()
+
+    def progress_path(self, job_id):
+        return os.path.join(self.job_dir, job_id + '.ndjson')
+
+    def submit(self, spec):
+        ''' Queues the job in spec, unless its result is cached or the same job is
+        already queued or running, and returns the job's dict.
+        '''
+        config, seed = job_config(spec)
+        key = cache_key(config, seed)
+        with self._lock:
+            if key in self._running:
+                return self.job(self._running[key])
+            job = {'job_id': uuid.uuid4().hex, 'status': 'queued', 'config': config,
+                'seed': seed, 'cached': False, 'submitted': time.time()}
+            self.jobs[job['job_id']] = job
+            result = self.cache.get(key)
+            if result is not None:
+                job.update(status='done', cached=True, finished=job['submitted'])
+                self._end(job['job_id'])
+                return dict(job, result=result)
+            self._running[key] = job['job_id']
+        self.pool.apply_async(run_job, (config, seed, self.progress_path(job['job_id'])),
+            callback=lambda result: self._finish(job, key, result=result),
+            error_callback=lambda error: self._finish(job, key, error=error))
+        return self.job(job['job_id'])
+
+    def _finish(self, job, key, result=None, error=None):
+        '''Pool callback: caches the result of a job, or records the error that stopped it.'''
+        if error is None:
+            self.cache.put(key, result)
+        with self._lock:
+            if error is None:
+                job['status'] = 'done'
+            else:
+                job.update(status='failed', error=f'{type(error).__name__}: {error}')
+            job['finished'] = time.time()
+            del self._running[key]
+            self._end(job['job_id'])
+
+    def _end(self, job_id):
+        '''Marks a job as ended and forgets the oldest over max_jobs. Needs the lock.'''
+        self._ended.append(job_id)
+        while len(self._ended) > self.max_jobs:
+            old_id = self._ended.popleft()
+            del self.jobs[old_id]
+            try:
+                os.remove(self.progress_path(old_id))
+            except FileNotFoundError:
+                pass
+
+    def job(self, job_id, with_result=True):
+        ''' Returns a copy of the job's dict, or None for an unknown or forgotten job id.
+        A done job's result is read from the cache unless with_result is False.
+        '''
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+        if job['status'] == 'queued' and os.path.exists(self.progress_path(job_id)):
+            job['status'] = 'running'
+        if job['status'] == 'done' and with_result:
+            job['result'] = self.cache.get(cache_key(job['config'], job['seed']))
+        return job
+
+    def _status(self, job_id):
+        job = self.job(job_id, with_result=False)
+        return 'forgotten' if job is None else job['status']
+
+    def iter_progress(self, job_id):
+        ''' Yields the progress lines of a job as they are written, until it is done,
+        failed or forgotten, then a last line with its status.
+        '''
+        position = 0
+        while True:
+            finished = self._status(job_id) in ('done', 'failed', 'forgotten')
+            try:
+                with open(self.progress_path(job_id)) as progress:
+                    progress.seek(position)
+                    lines = progress.read()
+            except FileNotFoundError:
+                lines = ''
+            #Only whole lines, the rest is still being written
+            lines = lines[:lines.rfind('\n') + 1]
+            position += len(lines)
+            yield from lines.splitlines(keepends=True)
+            if finished:
+                break
+            time.sleep(POLL_INTERVAL)
+        yield json.dumps({'status': self._status(job_id)}) + '\n'
+
+    def close(self):
+        '''Stops the worker pool, dropping queued jobs.'''
+        self.pool.terminate()
+        self.pool.join()
+
+
+class JobHandler(BaseHTTPRequestHandler):
+    ''' Serves the routes in the module docstring from the server's JobService. '''
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/jobs':
+            return self._send_json(404, {'error': f'No route {self.path}'})
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            job = self.server.service.submit(json.loads(self.rfile.read(length) or b'{}'))
+        except ValueError as error:
+            return self._send_json(400, {'error': str(error)})
+        self._send_json(202 if job['status'] in ('queued', 'running') else 200, job)
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path.rstrip('/') == '/jobs':
+            with service._lock:
+                job_ids = list(service.jobs)
+            return self._send_json(200, {'jobs': [{'job_id': job_id,
+                'status': service._status(job_id)} for job_id in job_ids]})
+        match = re.fullmatch(r'/jobs/(\w+)(/progress)?/?', self.path)
+        job = service.job(match.group(1), with_result=not match.group(2)) if match else None
+        if job is None:
+            return self._send_json(404, {'error': f'No job at {self.path}'})
+        if not match.group(2):
+            return self._send_json(200, job)
+        #Streams until the job ends, the connection closing marks the end of the body
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        for line in service.iter_progress(job['job_id']):
+            self.wfile.write(line.encode('utf-8'))
+            self.wfile.flush()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(service, port=8000, verbose=False):
+    '''Returns an HTTP server for service on localhost. Port 0 picks a free port.'''
+    server = ThreadingHTTPServer(('127.0.0.1', port), JobHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+if __name__ == "__main__":
+    #python3 service.py --port 8000
+    #curl -d '{"pop_size": 5000, "vacc_percentage": 0.8, "seed": 1}' localhost:8000/jobs
+    parser = argparse.ArgumentParser(description='Runs simulation jobs sent over HTTP.')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--processes', type=int, default=None,
+        help='worker processes, defaults to one per core')
+    parser.add_argument('--cache', default='service_cache', help='result cache directory')
+    parser.add_argument('--jobs', default='service_jobs', help='progress file directory')
+    parser.add_argument('--max-entries', type=int, default=10000,
+        help='results to keep in the cache before deleting the least recently used')
+    parser.add_argument('--max-jobs', type=int, default=10000,
+        help='ended jobs to keep before forgetting the oldest and their progress files')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    service = JobService(args.cache, args.jobs, args.processes, args.max_entries, args.max_jobs)
+    server = make_server(service, args.port, args.verbose)
+    print(f'Serving simulation jobs on http://127.0.0.1:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -0,0 +1,118 @@
+import random, sys
+random.seed(42)
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from ensemble import run_replicate
+from service import JobService, LRUResultCache, ProgressLogger, job_config, make_server
+import pytest
+
+SPEC = {'pop_size': 300, 'vacc_percentage': 0.5, 'repro_rate': 0.3, 'engine': 'array', 'seed': 4}
+
+
+@pytest.fixture
+def url(tmp_path):
+    service = JobService(str(tmp_path / 'cache'), str(tmp_path / 'jobs'), processes=1)
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+def request(url, body=None):
+    data = None if body is None else json.dumps(body).encode('utf-8')
+    with urllib.request.urlopen(url, data) as response:
+        return response.read()
+
+def wait_for(url, job_id):
+    for _ in range(200):
+        job = json.loads(request(f'{url}/jobs/{job_id}'))
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError('job did not finish')
+
+
+def test_job_runs_then_comes_from_cache(url):
+    job = json.loads(request(f'{url}/jobs', SPEC))
+    assert job['status'] in ('queued', 'running') and not job['cached']
+    job = wait_for(url, job['job_id'])
+    config, seed = job_config(SPEC)
+    assert job['result'] == run_replicate(config, seed)
+    progress = [json.loads(line) for line in request(f"{url}/jobs/{job['job_id']}/progress").splitlines()]
+    assert [line['step'] for line in progress[:-1]] == list(range(1, job['result']['steps'] + 1))
+    assert progress[-1] == {'status': 'done'}
+    #The same config and seed is answered from the cache without running
+    again = json.loads(request(f'{url}/jobs', SPEC))
+    assert again['cached'] and again['status'] == 'done'
+    assert again['result'] == job['result']
+    listed = json.loads(request(f'{url}/jobs'))['jobs']
+    assert {entry['job_id'] for entry in listed} == {job['job_id'], again['job_id']}
+
+def test_errors(url):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        request(f'{url}/jobs/missing')
+    assert error.value.code == 404
+    with pytest.raises(urllib.error.HTTPError) as error:
+        request(f'{url}/jobs', {'engine': 'quantum'})
+    assert error.value.code == 400
+    for spec in [{'pop_size': 'many'}, {'pop_sise': 100}, {'repro_rate': 1.5},
+        {'seed': True}, {'shards': 4}, {'engine': 'sharded', 'shards': '4'}]:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            request(f'{url}/jobs', spec)
+        assert error.value.code == 400
+    assert job_config({'engine': 'network', 'network': 'random:8'})[0]['network'] == 'random:8'
+    #Inputs only the engine can check still fail the job
+    job = json.loads(request(f'{url}/jobs', {'engine': 'network', 'network': 'nonsense'}))
+    assert wait_for(url, job['job_id'])['status'] == 'failed'
+
+def test_lru_result_cache(tmp_path):
+    cache = LRUResultCache(str(tmp_path), max_entries=2)
+    cache.put('aa1', {'n': 1})
+    cache.put('bb2', {'n': 2})
+    assert cache.get('aa1') == {'n': 1}
+    #bb2 is now the least recently used
+    cache.put('cc3', {'n': 3})
+    assert 'bb2' not in cache
+    assert 'aa1' in cache and 'cc3' in cache
+    #The order is read back from the files
+    os.utime(cache.path('aa1'), (0, 0))
+    reloaded = LRUResultCache(str(tmp_path), max_entries=1)
+    assert len(reloaded) == 1 and 'cc3' in reloaded and 'aa1' not in reloaded
+
+def test_progress_logger(tmp_path):
+    logger = ProgressLogger(str(tmp_path / 'progress.ndjson'))
+    logger.log_time_step(1, 2, 3, 4, 5, 6)
+    with open(logger.file_name) as progress:
+        assert json.loads(progress.read()) == {'step': 1, 'current_infected': 3,
+            'newly_infected': 5, 'dead_this_step': 6, 'total_infected': 4, 'total_dead': 2}
+
+def test_ended_jobs_are_forgotten(tmp_path):
+    service = JobService(str(tmp_path / 'cache'), str(tmp_path / 'jobs'), processes=1,
+        max_entries=1, max_jobs=2)
+    try:
+        first = service.submit(SPEC)
+        for _ in range(200):
+            if service.job(first['job_id'])['status'] == 'done':
+                break
+            time.sleep(0.05)
+        #Results are not kept in the jobs, only in the cache
+        assert 'result' not in service.jobs[first['job_id']]
+        assert service.job(first['job_id'])['result'] is not None
+        assert os.path.exists(service.progress_path(first['job_id']))
+        cached = [service.submit(SPEC) for _ in range(2)]
+        assert all(job['cached'] and job['result'] for job in cached)
+        assert service.job(first['job_id']) is None
+        assert not os.path.exists(service.progress_path(first['job_id']))
+        assert list(service.jobs) == [job['job_id'] for job in cached]
+        assert list(service.iter_progress(first['job_id'])) == ['{"status": "forgotten"}\n']
+        #A result deleted from the cache shows up as null
+        service.cache.put('other', {'n': 1})
+        assert service.job(cached[-1]['job_id'])['result'] is None
+    finally:
+        service.close()
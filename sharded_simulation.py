@@ -0,0 +1,180 @@
+import ctypes
+import multiprocessing
+import os
+import weakref
+import numpy as np
+from array_simulation import ArraySimulation, draw_contacts, roll_contacts
+
+#Population arrays kept in shared memory, with their dtype and ctypes type
+SHARED = {
+    'alive': (np.bool_, ctypes.c_bool),
+    'vaccinated': (np.bool_, ctypes.c_bool),
+    'infected': (np.bool_, ctypes.c_bool),
+    'living': (np.int64, ctypes.c_int64),
+    'living_position': (np.int64, ctypes.c_int64),
+}
+
+#Shards the infected are split into by default. It is fixed rather than taken from the
+#number of cores, since results depend on it.
+DEFAULT_SHARDS = 16
+
+#Population arrays of a worker process, mapped by _attach
+_arrays = {}
+
+
+def _as_arrays(blocks):
+    '''Returns NumPy arrays over the shared memory blocks of a population.'''
+    return {name: np.frombuffer(block, dtype=SHARED[name][0]) for name, block in blocks.items()}
+
+
+def _attach(blocks):
+    '''Pool initializer: maps the shared population into the worker.'''
+    _arrays.clear()
+    _arrays.update(_as_arrays(blocks))
+
+
+def _run_shard(task, arrays=None):
+    ''' Runs the interactions of one shard of the infected for one step.
+    Only reads the population, so every shard can run at the same time.
+
+        Args:
+            task (tuple): Slots of the shard's infected, number of living people, how
+                much of the front of living each infected person can meet, entropy and
+                spawn key of the shard's seed, repro rate, contacts per person, chunk
+                size, and whether to return every interaction.
+            arrays (dict): Population arrays, those of the worker process by default.
+
+        Returns:
+            tuple: Slots infected (possibly repeated), number of vaccinated contacts,
+            and a list of (sources, contacts, outcome codes) arrays if asked for.
+    '''
+    slots, living_count, reach, entropy, spawn_key, repro_rate, count, chunk_size, log = task
+    arrays = _arrays if arrays is None else arrays
+    rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=spawn_key))
+    living = arrays['living'][:living_count]
+    new_infections, saved, events = [], 0, []
+    for start in range(0, len(slots), chunk_size):
+        positions = arrays['living_position'][slots[start:start + chunk_size]]
+        sources, contacts = draw_contacts(rng, living, positions, count,
+            reach[start:start + chunk_size])
+        chunk_saved, infect, outcomes = roll_contacts(rng, sources, contacts,
+            arrays['vaccinated'], arrays['infected'], repro_rate, log)
+        saved += chunk_saved
+        new_infections.append(contacts[infect])
+        if log:
+            events.append((sources, contacts, outcomes))
+    return new_infections, saved, events
+
+
+def _close_pool(pool):
+    '''Stops a worker pool, also when its simulation is garbage collected.'''
+    pool.terminate()
+
+
+class ShardedSimulation(ArraySimulation):
+    ''' ArraySimulation that runs the interactions of each time step over a pool of
+    worker processes, for single runs too large for one core.
+
+    The population arrays live in shared memory that every worker maps. Each step
+    the infected are split into shards, and every shard draws its contacts and
+    infections in a worker with its own random stream, seeded from the simulation's
+    seed, the step and the shard. The new infections are merged at the end of the
+    step, where the arrays are updated by the main process. Deaths are rolled by
+    the main process before the shards start, see ArraySimulation.time_step.
+
+    Results depend on the seed and the number of shards, not on the number of
+    processes, so a run can be checked against processes=1.
+    '''
+    #The default shards and shard seeds changed since ArraySimulation's version
+    engine_version = ArraySimulation.engine_version + 1
+    engine_name = 'sharded'
+    config_options = {'shards': int}
+    profile_phases = ('_interact', '_resolve_infections', '_remove_living',
+        '_infect_newly_infected')
+
+    def __init__(self, pop_size, vacc_percentage, virus, initial_infected=10,
+        processes=None, shards=None, **kwargs):
+        ''' processes defaults to one per core and shards to DEFAULT_SHARDS.
+        Other keyword arguments are passed on to ArraySimulation.
+        '''
+        super().__init__(pop_size, vacc_percentage, virus, initial_infected, **kwargs)
+        self.processes = processes or os.cpu_count() # Int
+        self.shards = shards or DEFAULT_SHARDS # Int
+        self._blocks = {} # Shared memory block of each array in SHARED
+        self._pool = None
+        self._finalizer = None
+
+    def _share(self):
+        '''Moves the population arrays into new shared memory blocks.'''
+        self.close()
+        self._blocks = {}
+        for name, (dtype, ctype) in SHARED.items():
+            array = getattr(self, name)
+            self._blocks[name] = multiprocessing.RawArray(ctype, len(array))
+        for name, array in _as_arrays(self._blocks).items():
+            array[:] = getattr(self, name)
+            setattr(self, name, array)
+
+    def _create_population(self, initial_infected):
+        super()._create_population(initial_infected)
+        self._share()
+
+    def _restore_population_state(self, arrays):
+        super()._restore_population_state(arrays)
+        self._share()
+
+    def config(self):
+        '''Returns the inputs of the simulation, with its number of shards.'''
+        config = super().config()
+        config['shards'] = self.shards
+        return config
+
+    def _map(self, tasks):
+        '''Runs _run_shard over tasks, in the worker pool when there is more than one
+        process, and returns the results in order.
+        '''
+        if self.processes == 1:
+            return [_run_shard(task, _as_arrays(self._blocks)) for task in tasks]
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.processes, initializer=_attach,
+                initargs=(self._blocks,))
+            self._finalizer = weakref.finalize(self, _close_pool, self._pool)
+        return self._pool.map(_run_shard, tasks, chunksize=1)
+
+    def _interact(self, infected_idx, reach=None):
+        ''' Runs the interactions of each shard of infected_idx, see _run_shard, and
+        returns the slots they infected. reach is as for ArraySimulation._interact.
+        '''
+        if len(self.living) <= 1 or not len(infected_idx):
+            return []
+        if reach is None:
+            reach = np.full(len(infected_idx), len(self.living))
+        #Drawn from the simulation's generator, so every call gets new streams however
+        #time steps are run, and checkpoints keep the sequence
+        key = tuple(self.seed_sequence.spawn_key) + (int(self.rng.integers(2 ** 63)),)
+        tasks = [(shard, len(self.living), shard_reach, self.seed_sequence.entropy,
+            key + (number,), self.virus.repro_rate,
+            self.interactions_per_person, self.chunk_size, self.logger.logs_interactions)
+            for number, (shard, shard_reach) in enumerate(zip(
+                np.array_split(infected_idx, self.shards), np.array_split(reach, self.shards)))]
+        new_infections = []
+        for shard_infections, saved, events in self._map(tasks):
+            new_infections.extend(shard_infections)
+            self.saved_from_vac += saved
+            for sources, contacts, outcomes in events:
+                self.logger.log_interactions(self.ids[sources], self.ids[contacts], outcomes)
+        return new_infections
+
+    def run(self, *args, **kwargs):
+        '''Runs the simulation like Simulation.run, then stops the worker pool.'''
+        try:
+            super().run(*args, **kwargs)
+        finally:
+            self.close()
+
+    def close(self):
+        '''Stops the worker pool. It is started again if another step is run.'''
+        if self._finalizer is not None:
+            self._finalizer()
+        self._pool = None
+        self._finalizer = None
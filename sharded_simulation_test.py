@@ -0,0 +1,91 @@
+import random, sys
+random.seed(42)
+import os
+import re
+import numpy as np
+from logger import Logger, LOG_NONE
+from virus import Virus
+from array_simulation import ArraySimulation
+from sharded_simulation import ShardedSimulation
+from simulation import Simulation, create_simulation
+import pytest
+
+
+def run(processes, shards, seed=5, logger=None):
+    virus = Virus("Smallpox", 0.2, 0.15)
+    sim = ShardedSimulation(3000, 0.50, virus, processes=processes, shards=shards, seed=seed,
+        logger=logger or Logger(os.devnull, os.devnull, log_level=LOG_NONE))
+    sim.run(plot=False)
+    return sim
+
+def test_processes_do_not_change_results():
+    single = run(1, 3)
+    pooled = run(2, 3)
+    assert single.plot_y == pooled.plot_y
+    assert single.plot_y2 == pooled.plot_y2
+    assert single.saved_from_vac == pooled.saved_from_vac
+    assert pooled._pool is None
+
+def test_seeds_and_shards_change_results():
+    assert run(1, 3).plot_y != run(1, 3, seed=6).plot_y
+    assert run(1, 3).saved_from_vac != run(1, 4).saved_from_vac
+
+def test_arrays_are_shared():
+    sim = run(1, 2)
+    assert not sim.alive.flags.owndata
+    assert sim.total_dead == sim.pop_size - np.count_nonzero(sim.alive)
+    assert sorted(sim.living) == list(np.flatnonzero(sim.alive))
+
+def test_logs_every_interaction(tmp_path):
+    log_name = str(tmp_path / "logs.txt")
+    sim = run(2, 2, logger=Logger(log_name, os.devnull))
+    with open(log_name) as log:
+        interactions = sum(re.match(r"\d+ (didn't )?infect(ed)? \d+", line) is not None
+            for line in log)
+    assert interactions == 100 * sim.total_infected + 100 * sim.initial_infected
+
+def test_config_keeps_shards():
+    sim = create_simulation({'pop_size': 100, 'vacc_percentage': 0.5, 'virus_name': 'Smallpox',
+        'mortality_rate': 0.15, 'repro_rate': 0.2, 'engine': 'sharded', 'shards': 3},
+        logger=Logger(os.devnull, os.devnull, log_level=LOG_NONE))
+    assert sim.shards == 3
+    assert sim.config()['shards'] == 3
+
+def test_default_shards_do_not_depend_on_processes():
+    virus = Virus("Smallpox", 0.2, 0.15)
+    quiet = Logger(os.devnull, os.devnull, log_level=LOG_NONE)
+    assert ShardedSimulation(100, 0.5, virus, processes=1, logger=quiet).shards == \
+        ShardedSimulation(100, 0.5, virus, processes=3, logger=quiet).shards
+
+def test_direct_time_steps_draw_new_streams():
+    #time_step() called without iter_steps must not repeat the same draws
+    virus = Virus("Smallpox", 1.0, 0.0)
+    sim = ShardedSimulation(3000, 0.50, virus, processes=1, shards=2, initial_infected=20,
+        logger=Logger(os.devnull, os.devnull, log_level=LOG_NONE))
+    sim._create_population(sim.initial_infected)
+    infected_idx = sim.infected_idx
+    first = sim._interact(infected_idx)
+    second = sim._interact(infected_idx)
+    assert not all(np.array_equal(a, b) for a, b in zip(first, second))
+
+def test_saved_from_vac_matches_person_engine():
+    virus = Virus("Ebola", 0.5, 0.7)
+    saved = {}
+    for engine, seeds in [('person', range(30)), ('sharded', range(100, 130))]:
+        saved[engine] = []
+        for seed in seeds:
+            config = {'engine': engine, 'pop_size': 500, 'vacc_percentage': 0.1,
+                'virus_name': virus.name, 'mortality_rate': virus.mortality_rate,
+                'repro_rate': virus.repro_rate, 'initial_infected': 10}
+            options = {'processes': 1} if engine == 'sharded' else {}
+            sim = create_simulation(config, seed=seed,
+                logger=Logger(os.devnull, os.devnull, log_level=LOG_NONE), **options)
+            sim.run(plot=False)
+            saved[engine].append(sim.saved_from_vac)
+    expected, sharded = np.array(saved['person']), np.array(saved['sharded'])
+    error = np.sqrt(expected.var() / len(expected) + sharded.var() / len(sharded))
+    assert abs(sharded.mean() - expected.mean()) < 4 * error
+
+def test_engine_version_follows_array_engine():
+    assert ShardedSimulation.engine_version == ArraySimulation.engine_version + 1
+    assert ArraySimulation.engine_version > Simulation.engine_version
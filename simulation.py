@@ -1,11 +1,87 @@
 import random, sys
-random.seed(42)
+import argparse
+import importlib
+from collections import namedtuple
 import numpy as np
+import checkpoint
 from person import Person
-from logger import Logger
+from population import seed_population
+from logger import Logger, LOG_LEVELS
 from virus import Virus
-import matplotlib.pyplot as plt
-from scipy.interpolate import UnivariateSpline
+
+#Simulation engines selectable by name, as (module, class) so they are only imported when used.
+ENGINES = {
+    'person': ('simulation', 'Simulation'),
+    'array': ('array_simulation', 'ArraySimulation'),
+    'aggregate': ('aggregate_simulation', 'AggregateSimulation'),
+    'network': ('network_simulation', 'NetworkSimulation'),
+    'sharded': ('sharded_simulation', 'ShardedSimulation'),
+    'kernel': ('kernel_simulation', 'KernelSimulation'),
+    'compact': ('compact_simulation', 'CompactSimulation'),
+}
+#Inputs every engine takes. Other keys of a config are options of its engine.
+CONFIG_KEYS = ('pop_size', 'vacc_percentage', 'virus_name', 'mortality_rate', 'repro_rate',
+    'initial_infected', 'engine')
+
+#What Simulation.iter_steps yields after every time step. The totals are cumulative.
+StepStats = namedtuple('StepStats', ['step', 'current_infected', 'newly_infected',
+    'dead_this_step', 'total_infected', 'total_dead', 'saved_from_vac'])
+
+
+def load_engine(name):
+    '''Returns the Simulation class registered under name in ENGINES.'''
+    module_name, class_name = ENGINES[name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def add_simulation_arguments(parser):
+    '''Adds the simulation inputs taken on the command line to an argparse parser.'''
+    parser.add_argument('pop_size', type=int)
+    parser.add_argument('vacc_percentage', type=float)
+    parser.add_argument('virus_name', type=str)
+    parser.add_argument('mortality_rate', type=float)
+    parser.add_argument('repro_num', type=float)
+    parser.add_argument('initial_infected', type=int, nargs='?', default=1)
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='person',
+        help='person runs a list of Person objects, array runs NumPy population arrays, '
+        'aggregate only keeps the number of people in each state, network runs the '
+        'arrays over a contact network, sharded runs the arrays over several processes, '
+        'kernel runs the person rules over the arrays in a compiled loop, compact runs '
+        'the person engine with one state byte per person')
+    parser.add_argument('--network', default=None, metavar='SPEC',
+        help='contact network of the network engine, such as random:20, households:4:2, '
+        'small-world:10:0.1 or edges:FILE, see network.py')
+
+
+def check_simulation_arguments(parser, args):
+    '''Exits with an argparse error for options add_simulation_arguments accepts but
+    the chosen engine does not take.
+    '''
+    if args.network is not None and args.engine != 'network':
+        parser.error('--network only applies to --engine network')
+
+
+def simulation_config(args):
+    '''Returns the inputs parsed by add_simulation_arguments as a config dict.'''
+    config = {'pop_size': args.pop_size, 'vacc_percentage': args.vacc_percentage,
+        'virus_name': args.virus_name, 'mortality_rate': args.mortality_rate,
+        'repro_rate': args.repro_num, 'initial_infected': args.initial_infected,
+        'engine': args.engine}
+    if args.network is not None:
+        config['network'] = args.network
+    return config
+
+
+def create_simulation(config, **kwargs):
+    '''Builds the Simulation described by a config dict like simulation_config returns.
+    Keys other than CONFIG_KEYS and keyword arguments are passed on to the Simulation.
+    '''
+    virus = Virus(config['virus_name'], config['repro_rate'], config['mortality_rate'])
+    for name, value in config.items():
+        if name not in CONFIG_KEYS:
+            kwargs.setdefault(name, value)
+    return load_engine(config.get('engine', 'person'))(config['pop_size'],
+        config['vacc_percentage'], virus, config.get('initial_infected', 1), **kwargs)
 
 
 class Simulation(object):
@@ -16,7 +92,19 @@ class Simulation(object):
     population that are vaccinated, the size of the population, and the amount of initially
     infected people in a population are all variables that can be set when the program is run.
     '''
-    def __init__(self, pop_size, vacc_percentage, virus, initial_infected=10):
+    #Raise whenever a change makes the same inputs and seed give different results,
+    #so cached results from older versions are not reused. Engines that change on
+    #their own set theirs as the version of the class they extend plus one, so
+    #raising this one raises theirs too.
+    engine_version = 4
+    engine_name = 'person' # Name of the engine in ENGINES
+    config_options = {} # Type of each key config() adds to CONFIG_KEYS
+    #Methods a time step spends its time in, timed separately by profiler.PhaseProfiler
+    profile_phases = ('_sample_contact', 'interaction', '_resolve_infection',
+        '_remove_living', '_infect_newly_infected')
+
+    def __init__(self, pop_size, vacc_percentage, virus, initial_infected=10, logger=None,
+        seed=42, resume=False):
         ''' Logger object logger records all events during the simulation.
         Population represents all Persons in the population.
         The next_person_id is the next available id for all created Persons,
@@ -31,9 +119,19 @@ class Simulation(object):
 
         All arguments will be passed as command-line arguments when the file is run.
         HINT: Look in the if __name__ == "__main__" function at the bottom.
+        A Logger can be passed in to change how it logs, it defaults to writing logs.txt.
+
+        Every random draw of the simulation comes from its own generators, seeded from
+        seed (an int or a numpy SeedSequence), so runs with the same seed are identical
+        and simulations with different seeds are independent.
+
+        A simulation made to resume from a checkpoint appends to its existing log
+        instead of starting a new one, see checkpoint.py.
         '''
-        self.logger = Logger('logs.txt', 'logs_formatting.txt')
-        self.population = [] # List of Person objects
+        if logger is None:
+            logger = Logger('logs.txt', 'logs_formatting.txt')
+        self.logger = logger
+        self.population = [] # List of Person objects, the person with _id i is at index i - 1
         self.pop_size = pop_size # Int
         self.virus = virus # Virus object
         self.initial_infected = initial_infected # Int
@@ -41,14 +139,48 @@ class Simulation(object):
         self.current_infected = 0 # Int
         self.vacc_percentage = vacc_percentage # float between 0 and 1
         self.total_dead = 0 # Int
+        self.total_vaccinated = 0 # Int
         self.saved_from_vac = 0
-        self.newly_infected = []
+        self.newly_infected = set() # Unique ids infected during the current time step
+        self.infected_people = [] # Person objects currently infected, in _id order
+        self.living = [] # Person objects alive, in no particular order
+        self.living_position = [] # Index in living of the person with _id i at index i - 1
+        self.time_step_counter = 0 # Int
+        self.plot_y = [] # People currently infected after each time step
+        self.plot_y2 = [] # Total deaths after each time step
+        self.seed = seed
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        #NumPy Generator for array draws, and a random.Random for the draws made one at
+        #a time, where it is much faster than the Generator
+        random_seed, = self.seed_sequence.spawn(1)
+        self.rng = np.random.default_rng(self.seed_sequence)
+        self.random = random.Random(int.from_bytes(random_seed.generate_state(4).tobytes(), 'little'))
+        self.started = resume # Bool, the population has been created or restored
 
         #Clearing Text Files and Printing metadata
-        self.logger.clear_file_text(self.logger.file_name)
+        if resume:
+            return
+        if self.logger.logs_summary:
+            self.logger.clear_file_text(self.logger.file_name)
         self.logger.write_metadata(pop_size, vacc_percentage, self.virus.name,
         self.virus.mortality_rate, self.virus.repro_rate, initial_infected)
 
+    def config(self):
+        '''Returns the inputs of the simulation as a config dict for create_simulation.'''
+        return {'pop_size': self.pop_size, 'vacc_percentage': self.vacc_percentage,
+            'virus_name': self.virus.name, 'mortality_rate': self.virus.mortality_rate,
+            'repro_rate': self.virus.repro_rate, 'initial_infected': self.initial_infected,
+            'engine': self.engine_name}
+
+    def spawn_rngs(self, count):
+        '''Returns count independent Generators spawned from the simulation's seed,
+        for work that is split up between several streams.
+        '''
+        return [np.random.default_rng(child) for child in self.seed_sequence.spawn(count)]
+
     def _create_population(self, initial_infected):
         '''This method will create the initial population.
             Args:
@@ -59,20 +191,67 @@ class Simulation(object):
                 list: A list of Person objects.
 
         '''
-        #Gets a list of random numbers in range pop_size to apply initial infections to
+        #Picks who is vaccinated and who is initially infected, see population.py
         amount_vaccinated = int(self.vacc_percentage * self.pop_size)
-        vacc_seeding = np.random.choice(range(1, (self.pop_size) + 1), amount_vaccinated, replace=False)
-        virus_seeding = np.random.choice(range(1, (self.pop_size) + 1), initial_infected, replace=False)
+        vaccinated, infected = seed_population(self.rng, self.pop_size,
+            amount_vaccinated, initial_infected)
 
-        #Checks if any person is in the previous lists, if assigned them corresponding variables
-        for i in range(self.pop_size):
-            person = Person(i+1, False, None)
+        #Gives every person the variables of their slot in the masks
+        for i, (is_vaccinated, is_infected) in enumerate(zip(vaccinated.tolist(), infected.tolist())):
+            person = Person(i+1, is_vaccinated, None)
             self.population.append(person)
-            if person._id in vacc_seeding: person.is_vaccinated = True
-            if person._id in virus_seeding:
-                self.newly_infected.append(person._id)
+            if is_infected:
+                self.newly_infected.add(person._id)
+                self.infected_people.append(person)
                 self.current_infected += 1
                 person.infection = self.virus
+            elif person.is_vaccinated:
+                self.total_vaccinated += 1
+        self.living = list(self.population)
+        self.living_position = list(range(self.pop_size))
+
+    def _population_state(self):
+        '''Returns the population as a dict of NumPy arrays, for checkpoints.'''
+        return {
+            'alive': np.array([person.is_alive for person in self.population], dtype=bool),
+            'vaccinated': np.array([person.is_vaccinated for person in self.population], dtype=bool),
+            'infected': np.array([person.infection is not None for person in self.population], dtype=bool),
+            #The order of living decides which contacts the next draws pick
+            'living': np.array([person._id for person in self.living], dtype=np.int64),
+        }
+
+    def _restore_population_state(self, arrays):
+        '''Rebuilds the population from the arrays _population_state returned.'''
+        self.population = []
+        for i, (alive, vaccinated, infected) in enumerate(zip(arrays['alive'].tolist(),
+            arrays['vaccinated'].tolist(), arrays['infected'].tolist())):
+            person = Person(i+1, vaccinated, self.virus if infected else None)
+            person.is_alive = alive
+            self.population.append(person)
+        self.infected_people = [person for person in self.population if person.infection is not None]
+        self.living = [self.population[id - 1] for id in arrays['living'].tolist()]
+        self.living_position = [0] * self.pop_size
+        for position, person in enumerate(self.living):
+            self.living_position[person._id - 1] = position
+
+    def _remove_living(self, person):
+        '''Removes a person who died from living. The last living person is moved
+        into their place, so removing takes constant time.
+        '''
+        position = self.living_position[person._id - 1]
+        last = self.living.pop()
+        if last is not person:
+            self.living[position] = last
+            self.living_position[last._id - 1] = position
+
+    def _sample_contact(self, person):
+        '''Returns a random living person other than person, in constant time.
+        Draws among everybody else in living, then skips over the person's own position.
+        '''
+        position = self.random.randrange(len(self.living) - 1)
+        if position >= self.living_position[person._id - 1]:
+            position += 1
+        return self.living[position]
 
     def _simulation_should_continue(self):
         ''' The simulation should only end if the entire population is dead
@@ -87,36 +266,66 @@ class Simulation(object):
         else:
             return True
 
-    def run(self):
-        ''' This method should run the simulation until all requirements for ending
-        the simulation are met.
-        '''
+    def _start(self):
+        '''Creates the population, unless it was already created or restored.'''
+        if self.started:
+            return
         self._create_population(self.initial_infected)
-        dead_this_step = 0
-        time_step_counter = 0
-        should_continue = self._simulation_should_continue()
-        plot_y = [self.current_infected]
-        plot_y2 = [self.total_dead]
+        self.time_step_counter = 0
+        self.plot_y = [self.current_infected]
+        self.plot_y2 = [self.total_dead]
+        self.started = True
+
+    def iter_steps(self):
+        ''' Runs the simulation one time step at a time, logging each step and
+        yielding a StepStats for it, until nobody is infected any more.
+
+        The caller can stop at any step. Iterating again later continues where it
+        stopped. Only run() logs the answers and closes the logger.
+        '''
+        self._start()
         #Runs until there are no more infected people. Only vaccinated or dead.
-        while should_continue:
+        while self._simulation_should_continue():
+            dead_before_step = self.total_dead
             self.time_step()
-            time_step_counter += 1
-            #Graph values
-            plot_y.append(self.current_infected)
-            plot_y2.append(self.total_dead)
-            current_dead = self.total_dead
-            dead_this_step = self.total_dead - current_dead
-            #Logs and checks if to repeat
-            self.logger.log_time_step(time_step_counter, self.total_dead,
-            self.current_infected, self.total_infected, len(self.newly_infected),
+            self.time_step_counter += 1
+            dead_this_step = self.total_dead - dead_before_step
+            newly_infected = self._count_newly_infected()
+            self.logger.log_time_step(self.time_step_counter, self.total_dead,
+            self.current_infected, self.total_infected, newly_infected,
             dead_this_step)
-            should_continue = self._simulation_should_continue()
+            yield StepStats(self.time_step_counter, self.current_infected,
+                newly_infected, dead_this_step, self.total_infected,
+                self.total_dead, self.saved_from_vac)
+
+    def _count_newly_infected(self):
+        '''Returns how many people the last time step infected.'''
+        return len(self.newly_infected)
 
-        print(f'The simulation has ended after {time_step_counter} turns.')
+    def run(self, plot=True, checkpoint_every=None, checkpoint_dir='checkpoint', show=True):
+        ''' This method should run the simulation until all requirements for ending
+        the simulation are met. The graph is skipped when plot is False, and saved
+        without being shown when show is False.
+
+        With checkpoint_every set, the whole state of the simulation is saved to
+        checkpoint_dir every that many steps, see checkpoint.py.
+        '''
+        self._start()
+        for stats in self.iter_steps():
+            #Graph values
+            self.plot_y.append(stats.current_infected)
+            self.plot_y2.append(stats.total_dead)
+            if (checkpoint_every and stats.current_infected
+                and stats.step % checkpoint_every == 0):
+                checkpoint.save_checkpoint(self, checkpoint_dir)
+
+        print(f'The simulation has ended after {self.time_step_counter} turns.')
         self.logger.log_answers(self.total_dead, self.total_infected,self.virus,
         self.pop_size, self.vacc_percentage, self.initial_infected, self.saved_from_vac)
+        self.logger.close()
         #Creates a graph about logs and answers
-        self.plot_graph(time_step_counter, plot_y, plot_y2)
+        if plot:
+            self.plot_graph(self.time_step_counter, self.plot_y, self.plot_y2, show=show)
 
     def time_step(self):
         ''' This method should contain all the logic for computing one time step
@@ -125,42 +334,35 @@ class Simulation(object):
         This includes:
             1. 100 total interactions with a random person for each infected person
                 in the population
-            2. If the person is dead, grab another random person from the population.
-                Since we don't interact with dead people, this does not count as an interaction.
-            3. Otherwise call simulation.interaction(person, random_person) and
-                increment interaction counter by 1.
+            2. The random person is drawn from the people still alive, so dead people
+                are never picked and every draw counts as an interaction.
+            3. Call simulation.interaction(person, random_person) for each of them.
             '''
 
-        total_interactions = 0
-        #If the random person isn't alive, we loop again without adding to interaction counter
-        for person in self.population:
-            if person.infection == self.virus and person.is_alive:
-                # person_id = person.id
-                while total_interactions < 100:
-                    random_person = random.choice(self.population)
-                    if random_person.is_alive and random_person._id != person._id:
-                        total_interactions += 1
-                        self.interaction(person, random_person)
-                total_interactions = 0
-                person.did_survive_infection()
-                self.logger.log_infection_survival(person)
+        self.newly_infected = set()
+        #Only the people in infected_people are visited, the counters are updated as
+        #their states change instead of recounting the whole population.
+        for person in self.infected_people:
+            #With nobody else alive there is no one left to interact with
+            if len(self.living) > 1:
+                for _ in range(100):
+                    self.interaction(person, self._sample_contact(person))
+            self._resolve_infection(person)
         self._infect_newly_infected()
-        #Gets values of Person Objects and assigns Simulation values based off their properties
-        died = 0
-        total_vaccinated = 0
-        current_infected = 0
-        for person in self.population:
-            if not person.is_alive:
-                died += 1
-            elif person.infection == self.virus:
-                self.total_infected += 1
-                current_infected += 1
-            elif person.is_vaccinated:
-                total_vaccinated += 1
+        self.current_infected = len(self.infected_people)
+        self.total_infected += self.current_infected
 
-        self.total_dead = died
-        self.current_infected = current_infected
-        self.total_vaccinated = total_vaccinated
+    def _resolve_infection(self, person):
+        '''Rolls whether an infected person survives, and counts them as dead or
+        vaccinated. The dead are removed from living.
+        '''
+        if person.did_survive_infection(self.random):
+            self.total_vaccinated += 1
+        else:
+            self.total_dead += 1
+            self._remove_living(person)
+        if self.logger.logs_survival:
+            self.logger.log_infection_survival(person)
 
     def interaction(self, person, random_person):
         '''This method should be called any time two living people are selected for an
@@ -182,32 +384,42 @@ class Simulation(object):
         elif random_person.infection != None:
             interacted = 'is_not_sick'
         else:
-            infect = random.random()
+            infect = self.random.random()
             if infect <= self.virus.repro_rate:
-                self.newly_infected.append(random_person._id)
+                self.newly_infected.add(random_person._id)
                 interacted = 'did_infect'
             else:
                 interacted = 'did_not_infect'
 
-        self.logger.log_interaction(person, random_person, interacted)
+        if self.logger.logs_interactions:
+            self.logger.log_interaction(person, random_person, interacted)
         return interacted
 
     def _infect_newly_infected(self):
-        ''' This method should iterate through the list of ._id stored in self.newly_infected
+        ''' This method should iterate through the set of ._id stored in self.newly_infected
         and update each Person object with the disease.
         '''
-        #Iterates through the newly_infected list, and sets their infection
-        #to the virus. Resets list after.
-        for person in self.population:
-            for id in self.newly_infected:
-                if person._id == id:
-                    person.infection= self.virus
-        self.newly_infected = []
-
-    def plot_graph(self, time_step, plot_y, plot_y2):
+        #Ids map straight to population slots, so each infection is a single lookup.
+        #The set is kept until the next time step so run() can report its size.
+        #The newly infected replace the people infected during the step, who have all
+        #died or recovered by now.
+        self.infected_people = []
+        for id in sorted(self.newly_infected):
+            person = self.population[id - 1]
+            person.infection = self.virus
+            self.infected_people.append(person)
+
+    def plot_graph(self, time_step, plot_y, plot_y2, show=True):
         '''Makes a graph using matplotlib. Takes in final step counter as x
         element, and the y value is the total amount of deaths or currently infected.
+        With show False the graph is only saved, without needing a display.
         '''
+        #Plotting libraries are slow to import, so they are only loaded for a graph
+        import matplotlib
+        if not show:
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        from scipy.interpolate import UnivariateSpline
         #For X and Y Values of Points, als smoothing points
         x = range(time_step + 1)
         y = np.array(plot_y)
@@ -239,23 +451,88 @@ class Simulation(object):
           'Total Deaths'], loc ='lower center', fontsize ='x-small')
         #Saves and shows graph made
         fig.savefig("Graph_Infected_and_Dead.png")
-        plt.show()
+        if show:
+            plt.show()
+        plt.close(fig)
 
 if __name__ == "__main__":
     #python3 simulation.py 5000 0.80 Smallpox 0.15 0.06 10
-    params = sys.argv[1:]
-    pop_size = int(params[0])
-    vacc_percentage = float(params[1])
-    virus_name = str(params[2])
-    mortality_rate = float(params[3])
-    repro_num = float(params[4])
-
-    if len(params) == 6:
-        initial_infected = int(params[5])
-    else:
-        initial_infected = 1
+    #A resumed run takes its inputs from the checkpoint: python3 simulation.py --resume checkpoint
+    resume_parser = argparse.ArgumentParser(add_help=False)
+    resume_parser.add_argument('--resume', metavar='DIR', default=None,
+        help='continue the run checkpointed in DIR')
+    resume_args, _ = resume_parser.parse_known_args()
+    parser = argparse.ArgumentParser(description='Herd immunity simulation.',
+        parents=[resume_parser])
+    if resume_args.resume is None:
+        add_simulation_arguments(parser)
+    parser.add_argument('--buffered-log', action='store_true',
+        help='keep the log open and write it from a background thread')
+    parser.add_argument('--log-format', choices=['text', 'binary'], default='text',
+        help='binary writes the compact event log logs.bin, read it with event_log.py')
+    parser.add_argument('--log-level', choices=list(LOG_LEVELS), default='interactions',
+        help='how much to log, each level includes the ones before it')
+    parser.add_argument('--log-sample', type=int, default=1, metavar='N',
+        help='only log one in every N interactions')
+    parser.add_argument('--log-compress', action='store_true',
+        help='write the text log as numbered gzip segments, read them with rotating_log.py')
+    parser.add_argument('--log-segment-size', type=int, default=64, metavar='MB',
+        help='compressed size of each segment of a --log-compress log')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the random draws')
+    parser.add_argument('--no-plot', action='store_true', help='skip the graph')
+    parser.add_argument('--headless', action='store_true',
+        help='save the graph without showing it, for machines without a display')
+    parser.add_argument('--checkpoint-every', type=int, default=None, metavar='N',
+        help='save a checkpoint every N time steps')
+    parser.add_argument('--checkpoint-dir', default='checkpoint',
+        help='directory the checkpoint is saved in')
+    parser.add_argument('--results', metavar='DIR', default=None,
+        help='add the steps and answers of the run to the results store in DIR, '
+        'see results_store.py')
+    parser.add_argument('--profile', metavar='FILE', default=None,
+        help='time every phase of every step, write them to FILE (.csv or .json) '
+        'and print a summary')
+    parser.add_argument('--processes', type=int, default=None,
+        help='worker processes of the sharded engine, defaults to one per core')
+    parser.add_argument('--shards', type=int, default=None,
+        help='pieces the infected are split into by the sharded engine, 16 by default. '
+        'Results depend on it, not on --processes')
+    args = parser.parse_args()
+    if args.resume is None:
+        check_simulation_arguments(parser, args)
+    if args.log_sample < 1:
+        parser.error('--log-sample must be at least 1')
+    if args.log_compress and args.log_format != 'text':
+        parser.error('--log-compress only works with --log-format text')
 
-    virus = Virus(virus_name, repro_num, mortality_rate)
-    sim = Simulation(pop_size, vacc_percentage, virus, initial_infected)
+    store = None
+    if args.results:
+        #Only runs added to a store load it
+        import results_store
+        store = results_store.ResultsStore(args.results)
+    #Resumed runs are not added to the store, and take their inputs from the checkpoint
+    run_params = {'seed': args.seed, 'engine': args.engine} if args.resume is None else None
+    log_name = 'logs.bin' if args.log_format == 'binary' else 'logs.txt'
+    logger = Logger(log_name, 'logs_formatting.txt', buffered=args.buffered_log,
+        log_format=args.log_format, log_level=LOG_LEVELS[args.log_level],
+        sample_rate=args.log_sample, compress=args.log_compress,
+        segment_bytes=args.log_segment_size * 1024 * 1024,
+        results_store=store, run_params=run_params)
+    if args.resume is None:
+        options = {}
+        if args.engine == 'sharded':
+            options = {'processes': args.processes, 'shards': args.shards}
+        sim = create_simulation(simulation_config(args), logger=logger, seed=args.seed, **options)
+    else:
+        sim = checkpoint.load_checkpoint(args.resume, logger=logger)
+    if args.profile:
+        #Only profiled runs load the profiler
+        import profiler
+        phase_profiler = profiler.PhaseProfiler(sim).attach()
 
-    sim.run()
+    sim.run(plot=not args.no_plot, checkpoint_every=args.checkpoint_every,
+        checkpoint_dir=args.checkpoint_dir, show=not args.headless)
+    if args.profile:
+        phase_profiler.detach()
+        phase_profiler.write(args.profile)
+        print(phase_profiler.summary_table())
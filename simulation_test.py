@@ -2,7 +2,7 @@ import random, sys
 random.seed(42)
 import numpy as np
 from person import Person
-from logger import Logger
+from logger import Logger, LOG_NONE
 from virus import Virus
 from simulation import Simulation
 import pytest
@@ -45,6 +45,106 @@ def test_infect_newly_infected():
     sim = Simulation(100, 0.90, virus)
     person1 = Person(1, False)
     sim.population.append(person1)
-    sim.newly_infected.append(person1._id)
+    sim.newly_infected.add(person1._id)
     sim._infect_newly_infected()
     assert person1.infection == virus
+
+def test_newly_infected_is_unique():
+    virus = Virus("Smallpox", 1.0, 0.15)
+    sim = Simulation(100, 0.90, virus)
+    person = Person(1, False, infection=virus)
+    random_person = Person(2, False)
+    sim.population.extend([person, random_person])
+    sim.interaction(person, random_person)
+    sim.interaction(person, random_person)
+    assert len(sim.newly_infected) == 1
+    sim._infect_newly_infected()
+    assert random_person.infection == virus
+
+def run_steps(sim):
+    sim._create_population(sim.initial_infected)
+    while sim._simulation_should_continue():
+        sim.time_step()
+    return sim.total_infected, sim.total_dead, sim.saved_from_vac
+
+def test_same_seed_same_run():
+    virus = Virus("Smallpox", 0.2, 0.15)
+    quiet = Logger("logs.txt", "logs_formatting.txt", log_level=LOG_NONE)
+    first = run_steps(Simulation(300, 0.50, virus, logger=quiet, seed=5))
+    #Global random state does not change the run
+    random.seed(1)
+    np.random.seed(1)
+    assert run_steps(Simulation(300, 0.50, virus, logger=quiet, seed=5)) == first
+    assert run_steps(Simulation(300, 0.50, virus, logger=quiet, seed=6)) != first
+
+def test_spawn_rngs():
+    virus = Virus("Smallpox", 0.2, 0.15)
+    sim = Simulation(100, 0.50, virus, seed=5)
+    first, second = sim.spawn_rngs(2)
+    assert first.random() != second.random()
+
+def test_plotting_is_imported_lazily():
+    import subprocess
+    code = "import sys, simulation; print('matplotlib' in sys.modules, 'scipy' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    assert output.stdout == 'False False\n'
+
+def test_run_without_plot():
+    virus = Virus("Smallpox", 0.06, 0.15)
+    sim = Simulation(200, 0.90, virus, logger=Logger("logs.txt", "logs_formatting.txt",
+        log_level=LOG_NONE))
+    sim.plot_graph = None
+    sim.run(plot=False)
+    assert sim.current_infected == 0
+
+def test_iter_steps():
+    virus = Virus("Smallpox", 0.2, 0.15)
+    sim = Simulation(300, 0.50, virus, logger=Logger("logs.txt", "logs_formatting.txt",
+        log_level=LOG_NONE))
+    steps = list(sim.iter_steps())
+    assert [stats.step for stats in steps] == list(range(1, len(steps) + 1))
+    assert steps[-1].current_infected == 0
+    assert steps[-1].total_dead == sim.total_dead
+    assert sum(stats.dead_this_step for stats in steps) == sim.total_dead
+    assert sum(stats.newly_infected for stats in steps) == sim.total_infected
+
+def test_iter_steps_stops_early():
+    virus = Virus("Smallpox", 0.2, 0.15)
+    quiet = Logger("logs.txt", "logs_formatting.txt", log_level=LOG_NONE)
+    expected = [stats.total_dead for stats in Simulation(300, 0.50, virus, logger=quiet).iter_steps()]
+    sim = Simulation(300, 0.50, virus, logger=quiet)
+    first = next(sim.iter_steps())
+    rest = list(sim.iter_steps())
+    assert [first.total_dead] + [stats.total_dead for stats in rest] == expected
+
+def test_counters_match_population():
+    virus = Virus("Smallpox", 0.2, 0.15)
+    sim = Simulation(300, 0.50, virus, logger=Logger("logs.txt", "logs_formatting.txt",
+        log_level=LOG_NONE))
+    for stats in sim.iter_steps():
+        infected = [person for person in sim.population if person.infection is not None]
+        assert sim.infected_people == infected
+        assert sim.current_infected == len(infected)
+        assert sim.total_dead == sum(not person.is_alive for person in sim.population)
+        assert sim.total_vaccinated == sum(person.is_alive and person.is_vaccinated
+            and person.infection is None for person in sim.population)
+
+def test_living_tracks_deaths():
+    virus = Virus("Ebola", 0.9, 0.25)
+    sim = Simulation(300, 0.10, virus, logger=Logger("logs.txt", "logs_formatting.txt",
+        log_level=LOG_NONE))
+    for stats in sim.iter_steps():
+        assert sorted(person._id for person in sim.living) == [person._id
+            for person in sim.population if person.is_alive]
+        for position, person in enumerate(sim.living):
+            assert sim.living_position[person._id - 1] == position
+    assert len(sim.living) == sim.pop_size - sim.total_dead
+
+def test_sample_contact():
+    virus = Virus("Smallpox", 0.2, 0.15)
+    sim = Simulation(3, 0.0, virus, logger=Logger("logs.txt", "logs_formatting.txt",
+        log_level=LOG_NONE))
+    sim._create_population(1)
+    sim._remove_living(sim.population[2])
+    #Only one other person is left alive
+    assert {sim._sample_contact(sim.population[0])._id for _ in range(20)} == {2}
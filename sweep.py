@@ -0,0 +1,175 @@
+import argparse
+import contextlib
+import csv
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+from ensemble import METRICS, run_replicate, run_replicates, summarize, run_adaptive, parse_targets
+from simulation import load_engine
+
+#Simulation inputs a grid spec can sweep, with their defaults
+GRID_DEFAULTS = {'pop_size': 5000, 'vacc_percentage': 0.9, 'virus_name': 'Virus',
+    'mortality_rate': 0.15, 'repro_rate': 0.06, 'initial_infected': 10, 'engine': 'person'}
+
+
+def expand_grid(spec):
+    '''Returns the config of every point of a grid spec. Each input in the spec is
+    either a single value or a list of values to sweep over.
+    '''
+    unknown = set(spec) - set(GRID_DEFAULTS)
+    if unknown:
+        raise ValueError(f'Unknown grid inputs: {", ".join(sorted(unknown))}')
+    values = {}
+    for name, default in GRID_DEFAULTS.items():
+        value = spec.get(name, default)
+        values[name] = value if isinstance(value, list) else [value]
+    return [dict(zip(values, point)) for point in itertools.product(*values.values())]
+
+
+def cache_key(config, seed):
+    '''Returns the hash that identifies the results of config run with seed.'''
+    engine_version = load_engine(config['engine']).engine_version
+    key = json.dumps({'params': config, 'seed': seed, 'engine_version': engine_version},
+        sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class ResultCache(object):
+    ''' Directory of replicate results stored as one JSON file per cache_key. '''
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key):
+        #Splits files over subdirectories so no directory gets too big
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def get(self, key):
+        '''Returns the stored result for key, or None.'''
+        try:
+            with open(self.path(key)) as cached:
+                return json.load(cached)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key, result):
+        '''Stores result under key. Writes a temporary file and renames it so an
+        interrupted write never leaves a partial result behind.
+        '''
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as cached:
+            json.dump(result, cached)
+        os.replace(temporary, path)
+
+
+def _run_task(task):
+    '''Pool worker: runs one (key, config, seed) task and returns the key and result.'''
+    key, config, seed = task
+    return key, run_replicate(config, seed)
+
+
+def run_sweep(spec, cache_dir, replicates=1, base_seed=0, processes=None):
+    '''Runs replicates seeds of every point of spec, skipping results already in
+    the cache, and stores each result as soon as it finishes. Returns a list of
+    (config, summary) pairs, one per point, summarized like ensemble.summarize.
+    '''
+    cache = ResultCache(cache_dir)
+    points = expand_grid(spec)
+    seeds = list(range(base_seed, base_seed + replicates))
+    keys = [[cache_key(config, seed) for seed in seeds] for config in points]
+    #An entry that cannot be read, such as one cut short, is run again
+    results = {key: cache.get(key) for point_keys in keys for key in point_keys}
+    tasks = [(key, config, seed)
+        for config, point_keys in zip(points, keys)
+        for key, seed in zip(point_keys, seeds) if results[key] is None]
+    if tasks:
+        if processes == 1:
+            for key, result in map(_run_task, tasks):
+                cache.put(key, result)
+                results[key] = result
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                for key, result in pool.imap_unordered(_run_task, tasks):
+                    cache.put(key, result)
+                    results[key] = result
+    return [(config, summarize([results[key] for key in point_keys]))
+        for config, point_keys in zip(points, keys)]
+
+
+def run_adaptive_sweep(spec, cache_dir, targets=None, min_replicates=10, max_replicates=500,
+    base_seed=0, processes=None, confidence=0.95):
+    ''' Runs every point of spec with ensemble.run_adaptive, so each point gets
+    replicates until its targets are met. Points far from the herd immunity threshold
+    stop early and the uncertain ones get more. Replicates go through the cache like
+    in run_sweep. Returns (config, summary) pairs like run_sweep.
+    '''
+    cache = ResultCache(cache_dir)
+    with contextlib.ExitStack() as stack:
+        pool = None
+        if processes != 1:
+            pool = stack.enter_context(multiprocessing.Pool(processes))
+
+        def runner(config):
+            def run(seeds):
+                results = [cache.get(cache_key(config, seed)) for seed in seeds]
+                missing = [seed for seed, result in zip(seeds, results) if result is None]
+                ran = {}
+                for result in run_replicates(config, missing, processes, pool):
+                    cache.put(cache_key(config, result['seed']), result)
+                    ran[result['seed']] = result
+                return [ran[seed] if result is None else result
+                    for seed, result in zip(seeds, results)]
+            return run
+
+        return [(config, run_adaptive(config, targets, min_replicates, max_replicates,
+            processes=processes, base_seed=base_seed, confidence=confidence,
+            runner=runner(config))) for config in expand_grid(spec)]
+
+
+def write_csv(results, file_name):
+    '''Writes one row per point with its inputs and the mean of each metric.'''
+    with open(file_name, 'w', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow(list(GRID_DEFAULTS) + ['replicates'] + [f'{metric}_mean' for metric in METRICS])
+        for config, summary in results:
+            writer.writerow([config[name] for name in GRID_DEFAULTS] + [summary['replicates']]
+                + [summary['metrics'][metric]['mean'] for metric in METRICS])
+
+
+if __name__ == "__main__":
+    #python3 sweep.py grid.json --replicates 5
+    #grid.json: {"vacc_percentage": [0.5, 0.7, 0.9], "repro_rate": [0.06, 0.25], "engine": "array"}
+    parser = argparse.ArgumentParser(description='Runs a simulation over a grid of inputs.')
+    parser.add_argument('grid', help='JSON file mapping inputs to a value or list of values')
+    parser.add_argument('--replicates', type=int, default=None,
+        help='seeds to run per point, 1 by default, or the least to run with --target, '
+        '10 by default')
+    parser.add_argument('--seed', type=int, default=0, help='first seed of every point')
+    parser.add_argument('--processes', type=int, default=None,
+        help='worker processes, defaults to one per core')
+    parser.add_argument('--cache', default='sweep_cache',
+        help='directory of finished results, rerunning skips them')
+    parser.add_argument('--output', default='sweep.csv')
+    parser.add_argument('--target', action='append', default=None, metavar='METRIC=WIDTH',
+        help='run each point until the confidence interval of METRIC is at most WIDTH '
+        'wide, see ensemble.py. Can be repeated.')
+    parser.add_argument('--max-replicates', type=int, default=500,
+        help='most replicates to run per point with --target')
+    args = parser.parse_args()
+
+    with open(args.grid) as grid:
+        spec = json.load(grid)
+    if args.target:
+        results = run_adaptive_sweep(spec, args.cache, parse_targets(args.target),
+            args.replicates or 10, args.max_replicates, args.seed, args.processes)
+    else:
+        results = run_sweep(spec, args.cache, args.replicates or 1, args.seed, args.processes)
+    write_csv(results, args.output)
+    print(f'Wrote {len(results)} points to {args.output}')
@@ -0,0 +1,66 @@
+import random, sys
+random.seed(42)
+import os
+import ensemble
+import sweep
+from sweep import expand_grid, cache_key, run_sweep, run_adaptive_sweep, ResultCache
+import pytest
+
+SPEC = {'pop_size': 300, 'vacc_percentage': [0.5, 0.9], 'repro_rate': [0.06, 0.3],
+    'engine': 'array'}
+
+
+def test_expand_grid():
+    points = expand_grid(SPEC)
+    assert len(points) == 4
+    assert {point['vacc_percentage'] for point in points} == {0.5, 0.9}
+    assert all(point['pop_size'] == 300 for point in points)
+    with pytest.raises(ValueError):
+        expand_grid({'vaccinated': 0.5})
+
+def test_cache_key():
+    config = expand_grid(SPEC)[0]
+    assert cache_key(config, 1) == cache_key(dict(config), 1)
+    assert cache_key(config, 1) != cache_key(config, 2)
+
+def test_result_cache(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    assert 'abc' not in cache
+    cache.put('abc', {'total_dead': 3})
+    assert 'abc' in cache
+    assert cache.get('abc') == {'total_dead': 3}
+
+def test_run_sweep_resumes(tmp_path, monkeypatch):
+    results = run_sweep(SPEC, str(tmp_path), replicates=2, processes=1)
+    assert len(results) == 4
+    assert all(summary['replicates'] == 2 for _, summary in results)
+    #A second run finds every result in the cache and runs nothing
+    def fail(config, seed):
+        raise AssertionError('cached point was run again')
+    monkeypatch.setattr(sweep, 'run_replicate', fail)
+    assert run_sweep(SPEC, str(tmp_path), replicates=2, processes=1) == results
+
+def test_run_adaptive_sweep(tmp_path):
+    targets = {'infected_fraction': 1.0}
+    results = run_adaptive_sweep(SPEC, str(tmp_path), targets, min_replicates=3,
+        max_replicates=6, processes=1)
+    assert len(results) == 4
+    assert all(summary['replicates'] == 3 for _, summary in results)
+    #Replicates are cached under the same keys as run_sweep
+    assert run_sweep(SPEC, str(tmp_path), replicates=3, processes=1) == \
+        [(config, ensemble.summarize([ResultCache(str(tmp_path)).get(cache_key(config, seed))
+            for seed in range(3)])) for config, _ in results]
+
+def test_run_sweep_reruns_unreadable_entries(tmp_path):
+    results = run_sweep(SPEC, str(tmp_path), replicates=1, processes=1)
+    cache = ResultCache(str(tmp_path))
+    config = expand_grid(SPEC)[0]
+    with open(cache.path(cache_key(config, 0)), 'w') as cached:
+        cached.write('{"total_dead": ')
+    assert run_sweep(SPEC, str(tmp_path), replicates=1, processes=1) == results
+    assert cache.get(cache_key(config, 0)) is not None
+    with open(cache.path(cache_key(config, 0)), 'w') as cached:
+        cached.write('')
+    adaptive = run_adaptive_sweep(SPEC, str(tmp_path), {'infected_fraction': 1.0},
+        min_replicates=2, processes=1)
+    assert adaptive[0][1]['replicates'] == 2